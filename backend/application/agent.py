@@ -1,48 +1,69 @@
+from typing import Any, Dict, Tuple
+
 from langchain.agents import create_tool_calling_agent, AgentExecutor
+from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+from langchain.agents.output_parsers.tools import ToolsAgentOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnablePassthrough
 
-from backend.infrastructure.config import load_main_config
+from backend.infrastructure.config import subscribe
 from backend.infrastructure.tools import build_tools
-from backend.application.prompts import build_common_prompt
-from backend.infrastructure.utils import convert_to_yaml, sanitize_messages
+from backend.application.prompts import build_system_prompt, get_history_cache
+from backend.infrastructure.utils import convert_to_yaml
+
+
+# (preset, tool_choice, config version) -> (client, client with the tool schemas bound)
+TOOL_BINDINGS: Dict[Tuple[str | None, str, int], Tuple[Any, Any]] = {}
 
 
+def bind_tools(ctx, tools) -> Any:
+    # Converting the tools' schemas is the costly part, and doesn't depend on the request
+    key = (ctx.model.model_preset, repr(ctx.tool_choice), ctx.cfg.version)
+    entry = TOOL_BINDINGS.get(key)
+    if entry is not None and entry[0] is ctx.base_llm:
+        return entry[1]
+    if ctx.tool_choice:
+        llm = ctx.base_llm.bind_tools(tools, tool_choice=ctx.tool_choice)
+    else:
+        llm = ctx.base_llm.bind_tools(tools)
+    # Replaced rather than added when the client changed, with server.reuse_clients = false
+    TOOL_BINDINGS[key] = (ctx.base_llm, llm)
+    return llm
+
+
+@subscribe
+def _clear_tool_bindings(_cfg) -> None:
+    TOOL_BINDINGS.clear()
+
 
 def build_search_executor(ctx) -> AgentExecutor:
     llm = ctx.llm
     tools = build_tools(ctx) if ctx.tool_choice != False else []
 
-    if ctx.focus :
-        focus_info = {
-            "name" : load_main_config().get("focuses.{}.name".format(ctx.focus)),
-            "description" : load_main_config().get("focuses.{}.llm_description".format(ctx.focus)),
-        }
-        focus_info = convert_to_yaml(focus_info)
-    else :
-        focus_info = "No active focus"
-
-    # Build prompt
-    template = ctx.cfg(f"prompts.{ctx.task}.template")
-
     if not ctx.additional_context:
         additional_context = "N/A"
     else:
         additional_context = convert_to_yaml(ctx.additional_context) if isinstance(ctx.additional_context, dict) else ctx.additional_context
 
-    template = template.format(additional_context=additional_context, focus_info=focus_info)
+    system_prompt = build_system_prompt(ctx.cfg, ctx.task, ctx.focus)
     prompt = ChatPromptTemplate.from_messages([
-        ("system", template),
-        *sanitize_messages(ctx.history),
+        system_prompt,
+        *get_history_cache().messages(ctx.conversation_id, ctx.history),
         ("placeholder", "{agent_scratchpad}"),
     ])
+    if "additional_context" in system_prompt.input_variables:
+        prompt = prompt.partial(additional_context=additional_context)
 
     if ctx.tool_choice == False:
-        pass
-    elif ctx.tool_choice:
-        llm = llm.bind_tools(tools, tool_choice=ctx.tool_choice)
+        agent = create_tool_calling_agent(llm, tools, prompt)
     else:
-        llm = llm.bind_tools(tools)
-    agent = create_tool_calling_agent(llm, tools, prompt)
+        # create_tool_calling_agent with the cached binding, it would bind the tools again
+        agent = (
+            RunnablePassthrough.assign(agent_scratchpad=lambda x: format_to_tool_messages(x["intermediate_steps"]))
+            | prompt
+            | bind_tools(ctx, tools)
+            | ToolsAgentOutputParser()
+        )
     executor = AgentExecutor(agent=agent, tools=tools)
     return executor
 
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from typing import Any, List, Optional
 
-from backend.infrastructure.providers import get_model, ModelConfig
+from backend.infrastructure.providers import create_client, get_model, ModelConfig
 
 
 @dataclass
@@ -17,6 +17,7 @@ class Context:
     history: List[Any] = field(default_factory=list)
     focus: Optional[str] = None
     current_message_id : Optional[str] = None
+    conversation_id: Optional[int] = None
 
     def _rebind_llm(self):
         if self.base_llm is None:
@@ -53,13 +54,15 @@ class Context:
 
 
 def initialize_context(cfg, task: str, model: str, additional_context: str, callbacks: Optional[List[Any]] = None,
-                       tool_choice: Optional[str] = "search_searx", history: Optional[List[Any]] = None, focus: Optional[str] = None, current_message_id: Optional[int] = None) -> Context:
+                       tool_choice: Optional[str] = "search_searx", history: Optional[List[Any]] = None, focus: Optional[str] = None, current_message_id: Optional[int] = None,
+                       conversation_id: Optional[int] = None) -> Context:
     callbacks = callbacks or []
     ctx = Context(cfg=cfg, task=task, additional_context=additional_context, callbacks=list(callbacks),
-                  tool_choice=tool_choice, model=model, history=history, focus=focus, current_message_id=current_message_id)
+                  tool_choice=tool_choice, model=model, history=history, focus=focus, current_message_id=current_message_id,
+                  conversation_id=conversation_id)
 
     model_ = get_model(cfg, model)
-    base_llm = model_.cls(streaming=True, **model_.config)
+    base_llm = create_client(cfg, model_)
     ctx.base_llm = base_llm
     ctx.model = model_
     ctx._rebind_llm()
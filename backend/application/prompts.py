@@ -1,5 +1,14 @@
-from langchain_core.prompts import ChatPromptTemplate
-from backend.infrastructure.utils import convert_to_yaml
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate
+from langchain_core.prompts.chat import BaseMessagePromptTemplate
+
+from backend.infrastructure.config import subscribe
+from backend.infrastructure.utils import convert_to_yaml, sanitize_string
+
+DEFAULT_HISTORY_CONVERSATIONS = 256
 
 
 def build_common_prompt(ctx) -> ChatPromptTemplate:
@@ -17,3 +26,82 @@ def build_common_prompt(ctx) -> ChatPromptTemplate:
         ("placeholder", "{agent_scratchpad}"),
     ])
     return prompt
+
+
+SYSTEM_PROMPTS: Dict[Tuple[str, str | None, int], SystemMessagePromptTemplate] = {}
+
+
+def build_system_prompt(cfg, task: str, focus: str | None) -> SystemMessagePromptTemplate:
+    """System prompt of `task` with the focus filled in, compiled once per config version.
+
+    {additional_context} is left as a prompt variable, it changes with every request.
+    """
+    key = (task, focus, cfg.version)
+    prompt = SYSTEM_PROMPTS.get(key)
+    if prompt is None:
+        if focus:
+            focus_info = convert_to_yaml({
+                "name": cfg.get(f"focuses.{focus}.name"),
+                "description": cfg.get(f"focuses.{focus}.llm_description"),
+            })
+        else:
+            focus_info = "No active focus"
+        template = cfg(f"prompts.{task}.template").format(additional_context="{additional_context}", focus_info=focus_info)
+        prompt = SYSTEM_PROMPTS[key] = SystemMessagePromptTemplate.from_template(template)
+    return prompt
+
+
+def compile_message(turn: Tuple[str, str]) -> BaseMessagePromptTemplate:
+    role, content = turn
+    return ChatPromptTemplate.from_messages([(role, sanitize_string(content))]).messages[0]
+
+
+class HistoryCache:
+    """Compiled prompt messages of each conversation's turns, so a request only sanitizes the new ones.
+
+    The cached chain is compared to the current one turn by turn: turns after the first
+    difference (the new query, or another branch) are compiled again.
+    """
+
+    def __init__(self, max_conversations: int = DEFAULT_HISTORY_CONVERSATIONS) -> None:
+        self.max_conversations = max_conversations
+        self._chains: OrderedDict[int, List[Tuple[Tuple[str, str], BaseMessagePromptTemplate]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def messages(self, conversation_id: int | None, history: List[Tuple[str, str]]) -> List[BaseMessagePromptTemplate]:
+        if conversation_id is None:
+            return [compile_message(turn) for turn in history]
+        with self._lock:
+            cached = self._chains.get(conversation_id, [])
+        reused = 0
+        for (turn, _), current in zip(cached, history):
+            if turn != tuple(current):
+                break
+            reused += 1
+        chain = cached[:reused] + [(tuple(turn), compile_message(turn)) for turn in history[reused:]]
+        with self._lock:
+            self._chains[conversation_id] = chain
+            self._chains.move_to_end(conversation_id)
+            while len(self._chains) > self.max_conversations:
+                self._chains.popitem(last=False)
+            self.stats["hits"] += reused
+            self.stats["misses"] += len(chain) - reused
+        return [message for _, message in chain]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._chains.clear()
+
+
+HISTORY_CACHE = HistoryCache()
+
+
+def get_history_cache() -> HistoryCache:
+    return HISTORY_CACHE
+
+
+@subscribe
+def _clear_system_prompts(_cfg) -> None:
+    # Entries of older versions can't be hit anymore
+    SYSTEM_PROMPTS.clear()
@@ -1,7 +1,10 @@
 import requests
+import re
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin, urlunparse
 from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List
 
 class SourcePreview(BaseModel):
     title: str | None = None
@@ -15,6 +18,59 @@ def remove_url_params(url: str) -> str:
     clean = parsed._replace(query="", fragment="")
     return urlunparse(clean)
 
+URL_PATTERN = re.compile(r'(https?:\/[^\s)]+)')
+TRAILING_PUNCTUATION = ".,;:!?'\"]>*_`"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def strip_trailing_punctuation(url: str) -> str:
+    while url and url[-1] in TRAILING_PUNCTUATION:
+        if url[-1] == "]" and url.count("[") >= url.count("]"):
+            # Closes an IPv6 host ("http://[::1]") or a bracket in the path
+            break
+        url = url[:-1]
+    return url
+
+def normalize_url(url: str) -> str:
+    url = strip_trailing_punctuation(url)
+    parsed = urlparse(url)
+    netloc = parsed.hostname or parsed.netloc
+    if parsed.hostname and ":" in parsed.hostname:
+        # hostname drops the brackets of IPv6 literals
+        netloc = f"[{netloc}]"
+    if parsed.port and DEFAULT_PORTS.get(parsed.scheme.lower()) != parsed.port:
+        netloc = f"{netloc}:{parsed.port}"
+    return urlunparse(parsed._replace(scheme=parsed.scheme.lower(), netloc=netloc.lower(), fragment=""))
+
+def extract_urls(text: str) -> List[str]:
+    # Normalized and deduplicated, in order of first appearance
+    return list(dict.fromkeys(normalize_url(url) for url in URL_PATTERN.findall(text)))
+
+# Marks URLs a batch didn't get to (deadline, cancelled), unlike None for a failed fetch
+NOT_FETCHED: Any = object()
+
+def fallback_preview(url: str) -> SourcePreview:
+    return SourcePreview(title=url, url=url, site_name=urlparse(url).netloc)
+
+def get_url_previews(urls: List[str], max_workers: int = 8, deadline: float = 10.0) -> Dict[str, SourcePreview | None]:
+    """Fetch previews concurrently. URLs that fail map to None, those that miss the deadline to NOT_FETCHED."""
+    previews: Dict[str, SourcePreview | None] = {url: NOT_FETCHED for url in urls}
+    if not urls:
+        return previews
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)))
+    try:
+        futures = {executor.submit(get_url_preview, url): url for url in urls}
+        done, _ = wait(futures, timeout=deadline)
+        for future in done:
+            try:
+                previews[futures[future]] = future.result()
+            except Exception as e:
+                print(f"Error fetching preview for {futures[future]}: {e}")
+                previews[futures[future]] = None
+    finally:
+        # Don't wait on stragglers, callers fall back to the bare URL
+        executor.shutdown(wait=False, cancel_futures=True)
+    return previews
+
 def get_url_preview(url: str) -> SourcePreview:
     headers = {"User-Agent": "Mozilla/5.0"}
     response = requests.get(url, timeout=5, headers=headers)
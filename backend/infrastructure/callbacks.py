@@ -1,6 +1,9 @@
 from langchain.callbacks.base import BaseCallbackHandler
 import asyncio
-import json
+import threading
+import time
+from collections import deque
+import orjson
 from uuid import UUID
 from langchain_core.agents import AgentFinish
 from langchain_core.outputs import LLMResult
@@ -8,6 +11,37 @@ from pydantic import BaseModel
 from typing import Callable, Any, Optional
 import glom
 
+DEFAULT_HEARTBEAT = 15.0
+DEFAULT_FLUSH_INTERVAL = 0.03
+DEFAULT_FLUSH_SIZE = 4096
+DEFAULT_MAX_PENDING = 1024
+DEFAULT_CHECKPOINT_INTERVAL = 2.0
+DEFAULT_CHECKPOINT_SIZE = 2048
+
+TOKEN_EVENTS = ("new_token", "new_thinking_token")
+OK_FRAME = b'{"event":"ok"}\n'
+HEARTBEAT_FRAME = b'{"event":"heartbeat"}\n'
+DONE_FRAME = b'{"event":"done"}\n'
+NOTHING = object()
+
+
+def encode_frame(payload: dict) -> bytes:
+    # Tool inputs/outputs aren't always JSON types, fall back to their string form
+    return orjson.dumps(payload, default=str) + b"\n"
+
+
+def mergeable(a: dict | None, b: dict | None) -> bool:
+    # Consecutive tokens of the same kind from the same run can share a frame
+    return (
+        a is not None and b is not None and a["event"] in TOKEN_EVENTS
+        and (a["event"], a.get("parent"), a.get("tags")) == (b["event"], b.get("parent"), b.get("tags"))
+    )
+
+
+class StreamCancelled(Exception):
+    """Raised from the callbacks to stop an agent run whose client went away."""
+
+
 class MessageOutput(BaseModel):
     content: str
     thinking_content : Optional[str] = None
@@ -18,27 +52,90 @@ class MessageOutput(BaseModel):
 
 
 class StreamingCallbackHandler(BaseCallbackHandler):
-    def __init__(self):
-        self.queue: asyncio.Queue[str] = asyncio.Queue()
-        self._done = asyncio.Event()
+    """Bridges LangChain callbacks fired in executor threads to the SSE generator on the event loop."""
+
+    # Cheap and non-blocking: on the async agent path, run on the loop instead of a worker thread
+    run_inline = True
+    # Let StreamCancelled propagate and abort the run instead of being logged and ignored
+    raise_error = True
+
+    def __init__(
+        self,
+        heartbeat: float = DEFAULT_HEARTBEAT,
+        coalesce: bool = True,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        flush_size: int = DEFAULT_FLUSH_SIZE,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        # Must be created on the event loop that consumes stream()
+        self.loop = asyncio.get_running_loop()
+        # Only touched from the loop: producers in other threads go through call_soon_threadsafe
+        self.events: deque[dict | None] = deque()
+        self.ready = asyncio.Event()
+        self.heartbeat = heartbeat
+        self.coalesce = coalesce
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self.cancelled = threading.Event()
         self.current = 0
+        self._pending = NOTHING
+        self._last_event = None
+
+    def _put(self, item: dict | None) -> None:
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._enqueue(item)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._enqueue, item)
+
+    def _enqueue(self, item: dict | None) -> None:
+        if self.events and len(self.events) >= self.max_pending and mergeable(self.events[-1], item):
+            tail = self.events[-1]
+            if len(tail["data"]) < self.flush_size:
+                # Slow consumer: fold the token into the last queued frame instead of growing the queue
+                self.events[-1] = tail | {"id": item["id"], "data": tail["data"] + item["data"]}
+                return
+        self.events.append(item)
+        self.ready.set()
+
+    async def _get(self, timeout: float) -> dict | None:
+        while not self.events:
+            self.ready.clear()
+            await asyncio.wait_for(self.ready.wait(), timeout=timeout)
+        return self.events.popleft()
+
+    def send(self, payload: dict) -> None:
+        # Encoding happens in stream(), once per (possibly merged) frame
+        self._put(payload)
+
+    def cancel(self) -> None:
+        # Checked by the callbacks, which run in the agent's thread on the sync path
+        self.cancelled.set()
+
+    def _check_cancelled(self) -> None:
+        if self.cancelled.is_set():
+            raise StreamCancelled()
 
     def on_llm_start(self, *args, **kwargs) -> None:
+        self._check_cancelled()
         run_parent = kwargs.get("parent_run_id")
         run_tags = kwargs.get("tags", [])
-        self.queue.put_nowait(
-            json.dumps(
-                {
-                    "event": "start",
-                    "id": self.current,
-                    "parent": str(run_parent) if run_parent else None,
-                    "tags": run_tags,
-                }
-            )
+        self.send(
+            {
+                "event": "start",
+                "id": self.current,
+                "parent": str(run_parent) if run_parent else None,
+                "tags": run_tags,
+            }
         )
         self.current += 1
 
     def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self._check_cancelled()
         run_parent = kwargs.get("parent_run_id")
         run_tags = kwargs.get("tags", [])
         if isinstance(token, list) :
@@ -50,73 +147,149 @@ class StreamingCallbackHandler(BaseCallbackHandler):
             else :
                 e_type = 'new_thinking_token'
                 token = glom.glom(token, "thinking.0.text", default="")
-        self.queue.put_nowait(
-            json.dumps(
-                {
-                    "event": e_type,
-                    "id": self.current,
-                    "data": token,
-                    "parent": str(run_parent) if run_parent else None,
-                    "tags": run_tags,
-                }
-            )
+        self.send(
+            {
+                "event": e_type,
+                "id": self.current,
+                "data": token,
+                "parent": str(run_parent) if run_parent else None,
+                "tags": run_tags,
+            }
         )
         self.current += 1
 
     def on_llm_end(self, *args, **kwargs) -> None:
         run_parent = kwargs.get("parent_run_id")
         run_tags = kwargs.get("tags", [])
-        self.queue.put_nowait(
-            json.dumps(
-                {
-                    "event": "llm_end",
-                    "id": self.current,
-                    "parent": str(run_parent) if run_parent else None,
-                    "tags": run_tags,
-                }
-            )
+        self.send(
+            {
+                "event": "llm_end",
+                "id": self.current,
+                "parent": str(run_parent) if run_parent else None,
+                "tags": run_tags,
+            }
         )
         self.current += 1
 
     def on_llm_error(self, error: Exception, **kwargs) -> None:
-        self.queue.put_nowait(json.dumps({"event": "error", "id": self.current, "data": str(error)}))
-        self._done.set()
+        self.send({"event": "error", "id": self.current, "data": str(error)})
+        self.done()
         self.current += 1
 
     def on_tool_start(self, tool_input: str, tool_name: str, **kwargs) -> None:
-        self.queue.put_nowait(
-            json.dumps({"event": "tool_start", "id": self.current, "data": {"tool_name": tool_name, "tool_input": tool_input}})
-        )
+        self._check_cancelled()
+        self.send({"event": "tool_start", "id": self.current, "data": {"tool_name": tool_name, "tool_input": tool_input}})
         self.current += 1
 
     def on_tool_end(self, output: str, **kwargs) -> None:
-        self.queue.put_nowait(json.dumps({"event": "tool_end", "id": self.current, "data": {"output": output}}))
+        self.send({"event": "tool_end", "id": self.current, "data": {"output": output}})
         self.current += 1
 
+    async def next_event(self, timeout: float | None = None) -> dict | None:
+        """Next event, with consecutive tokens merged. None once the run is done.
+
+        Raises asyncio.TimeoutError when nothing arrived within `timeout` seconds.
+        """
+        if self._pending is not NOTHING:
+            item, self._pending = self._pending, NOTHING
+        else:
+            item = await self._get(timeout)
+        if item is None:
+            return None
+        if self.coalesce and item["event"] in TOKEN_EVENTS:
+            # The first tokens of a run go out right away so time-to-first-token isn't delayed
+            wait = self.flush_interval if self._last_event == item["event"] else 0
+            item, self._pending = await self._coalesce(item, wait)
+        self._last_event = item["event"]
+        return item
+
     async def stream(self):
-        yield json.dumps({"event": "ok"}) + "\n"
-        while not (self._done.is_set() and self.queue.empty()):
+        yield OK_FRAME
+        while True:
             try:
-                item = await asyncio.wait_for(self.queue.get(), timeout=0.25)
-                yield f"{item}\n"
+                item = await self.next_event(self.heartbeat)
             except asyncio.TimeoutError:
-                yield json.dumps({"event": "heartbeat"}) + "\n"
-        yield json.dumps({"event": "done"}) + "\n"
+                # Only sent when nothing else was, to keep idle proxies from closing the connection
+                yield HEARTBEAT_FRAME
+                continue
+            if item is None:
+                break
+            yield encode_frame(item)
+        yield DONE_FRAME
+
+    async def _coalesce(self, first: dict, wait: float) -> tuple[dict, Any]:
+        """Merge the tokens queued after `first` until another event, flush_size or `wait` seconds.
+
+        The merged frame keeps the fields of `first` and the id of the last merged token, so ids
+        stay strictly increasing. Also returns the item that interrupted the merge, or NOTHING.
+        """
+        parts = [first["data"]]
+        size = len(first["data"])
+        last_id = first["id"]
+        deadline = self.loop.time() + wait
+        interrupted = NOTHING
+        while size < self.flush_size:
+            remaining = deadline - self.loop.time()
+            if not self.events and remaining <= 0:
+                break
+            try:
+                item = await self._get(remaining)
+            except asyncio.TimeoutError:
+                break
+            if not mergeable(first, item):
+                interrupted = item
+                break
+            parts.append(item["data"])
+            size += len(item["data"])
+            last_id = item["id"]
+        return first | {"id": last_id, "data": "".join(parts)}, interrupted
 
     def done(self):
-        self._done.set()
+        # Queued after every pending event, so the consumer drains them before stopping
+        self._put(None)
+
+
+class MessageBuffer:
+    """Chunks of one run's answer, joined only when read instead of on every token."""
+
+    def __init__(self) -> None:
+        self.content: list[str] = []
+        self.thinking: list[str] = []
+
+    def output(self) -> MessageOutput:
+        return MessageOutput(content="".join(self.content), thinking_content="".join(self.thinking))
 
 
 class BasicCallbackHandler(BaseCallbackHandler):
-    def __init__(self, callback: Callable) -> None:
+    """Accumulates the answer's tokens, for the final write and the checkpoints.
+
+    Runs inline on the async agent path, in token order and without a thread hop per token:
+    `callback` and `checkpoint` are then called on the event loop and mustn't block.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        callback: Callable,
+        checkpoint: Callable | None = None,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+        checkpoint_size: int = DEFAULT_CHECKPOINT_SIZE,
+    ) -> None:
         super().__init__()
         self.callback = callback
-        self.buffers: dict[UUID, MessageOutput] = {}
+        self.buffers: dict[UUID, MessageBuffer] = {}
+        # Given the partial messages every checkpoint_interval seconds or checkpoint_size characters
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_size = checkpoint_size
+        self._last_checkpoint = time.monotonic()
+        self._unsaved = 0
 
     def on_llm_start(self, *_args, **_kwargs) -> None:
         run_id: UUID = _kwargs.get("parent_run_id")
         if run_id is not None:
-            self.buffers.setdefault(run_id, MessageOutput.empty())
+            self.buffers.setdefault(run_id, MessageBuffer())
 
     def on_llm_new_token(
         self,
@@ -135,9 +308,21 @@ class BasicCallbackHandler(BaseCallbackHandler):
                     token = token["text"]
                 else :
                     token = glom.glom(token, "thinking.0.text", default="")
-                    self.buffers[run_parent].thinking_content += token
+                    self.buffers[run_parent].thinking.append(token)
+                    self._maybe_checkpoint(len(token))
                     return
-            self.buffers[run_parent].content += token
+            self.buffers[run_parent].content.append(token)
+            self._maybe_checkpoint(len(token))
+
+    def _maybe_checkpoint(self, size: int) -> None:
+        if self.checkpoint is None:
+            return
+        self._unsaved += size
+        now = time.monotonic()
+        if self._unsaved >= self.checkpoint_size or now - self._last_checkpoint >= self.checkpoint_interval:
+            self._unsaved = 0
+            self._last_checkpoint = now
+            self.checkpoint(self.messages())
 
     def on_agent_finish(
         self,
@@ -147,8 +332,10 @@ class BasicCallbackHandler(BaseCallbackHandler):
         parent_run_id: Optional[UUID] = None,
         **kwargs: Any
     ) -> Any:
-        messages = [buf for _, buf in self.buffers.items()]
-        self.callback(messages)
+        self.callback(self.messages())
+
+    def messages(self) -> list[MessageOutput]:
+        return [buf.output() for _, buf in self.buffers.items()]
 
 class LLMEndCallbackHandler(BaseCallbackHandler):
     def __init__(self, callback: Callable) -> None:
@@ -1,4 +1,6 @@
 import io
+import os
+import threading
 try:
     import tomllib  # Python 3.11+
 except ModuleNotFoundError:  # pragma: no cover
@@ -6,28 +8,145 @@ except ModuleNotFoundError:  # pragma: no cover
 from glom import glom
 from io import BytesIO
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
 
 CONFIG_PATH = (Path(__file__).resolve().parents[2] / "config.toml")
 
+def flatten(data: Any) -> Dict[str, Any]:
+    """Every table, array element and value of a parsed config, by dotted path ("searx.verify", "a.0")."""
+    index = {}
+    stack = [("", data)]
+    while stack:
+        prefix, node = stack.pop()
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            continue
+        for key, value in items:
+            key = str(key)
+            if "." in key:
+                # Quoted TOML key, glom would split it: not reachable with a dotted path
+                continue
+            path = f"{prefix}.{key}" if prefix else key
+            index[path] = value
+            stack.append((path, value))
+    return index
+
+
 class GlomWrapper:
-    def __init__(self, data: dict):
+    def __init__(self, data: dict, version: int = 0):
         self.data = data
+        # Bumped on every reload of the file, for caches derived from the config
+        self.version = version
+        self._index: Dict[str, Any] | None = None
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        # Built on first use, snapshots aren't mutated afterwards
+        if self._index is None:
+            self._index = flatten(self.data)
+        return self._index
 
     def get(self, path: str, default=None, **kwargs):
-        try:
-            return glom(self.data, path, **kwargs)
-        except Exception:
-            return default
+        if kwargs or not isinstance(path, str):
+            # Glom specs (Coalesce, T, ...) and options still go through glom
+            try:
+                return glom(self.data, path, **kwargs)
+            except Exception:
+                return default
+        return self.index.get(path, default)
 
     def __call__(self, path: str, default=None, **kwargs):
         return self.get(path, default=default, **kwargs)
 
 
+class ConfigStore:
+    """Parsed snapshot of one config file, re-read only when its mtime or size changes.
+
+    Snapshots are shared by every caller: treat them as read-only and copy before mutating.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.snapshot: GlomWrapper | None = None
+        self.stamp: Tuple[int, int] | None = None
+        self.lock = threading.Lock()
+
+    def get(self) -> GlomWrapper:
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self.snapshot is not None and stamp == self.stamp:
+            return self.snapshot
+        return self.reload(stamp)
+
+    def reload(self, stamp: Tuple[int, int] | None = None) -> GlomWrapper:
+        with self.lock:
+            if stamp is None:
+                stat = os.stat(self.path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+            elif self.snapshot is not None and stamp == self.stamp:
+                # Another thread reloaded it meanwhile
+                return self.snapshot
+            with io.open(self.path, "r", encoding="utf-8") as f:
+                cfg_str = f.read()
+            previous = self.snapshot
+            self.snapshot = GlomWrapper(tomllib.loads(cfg_str), version=next_version())
+            self.stamp = stamp
+            snapshot = self.snapshot
+        if previous is not None:
+            notify(snapshot)
+        return snapshot
+
+
+STORES: Dict[Path, ConfigStore] = {}
+STORES_BY_NAME: Dict[str, ConfigStore] = {}
+STORES_LOCK = threading.Lock()
+SUBSCRIBERS: List[Callable[[GlomWrapper], None]] = []
+_VERSION = 0
+
+
+def next_version() -> int:
+    global _VERSION
+    _VERSION += 1
+    return _VERSION
+
+
+def subscribe(callback: Callable[[GlomWrapper], None]) -> Callable[[GlomWrapper], None]:
+    """Call `callback` with the new snapshot whenever a loaded config file changes, usable as a decorator."""
+    SUBSCRIBERS.append(callback)
+    return callback
+
+
+def notify(snapshot: GlomWrapper) -> None:
+    for callback in SUBSCRIBERS:
+        try:
+            callback(snapshot)
+        except Exception as e:
+            print(f"Config subscriber {callback.__qualname__} failed: {e!r}")
+
+
+def get_config_store(path: str) -> ConfigStore:
+    store = STORES_BY_NAME.get(path)
+    if store is not None:
+        return store
+    # "config.toml" and CONFIG_PATH usually name the same file and share a store
+    resolved = Path(path).resolve()
+    with STORES_LOCK:
+        if resolved not in STORES:
+            STORES[resolved] = ConfigStore(resolved)
+        STORES_BY_NAME[path] = STORES[resolved]
+        return STORES[resolved]
+
+
 def load_config(path: str = "config.toml") -> GlomWrapper:
-    with io.open(path, "r", encoding="utf-8") as f:
-        cfg_str = f.read()
-    cfg = tomllib.loads(cfg_str)
-    return GlomWrapper(cfg)
+    return get_config_store(path).get()
+
+
+def reload_config(path: str = "config.toml") -> GlomWrapper:
+    # For writers: mtime resolution may hide a write made right after the last read
+    return get_config_store(path).reload()
 
 
 def config_check(string: str):
@@ -40,4 +159,3 @@ def config_check(string: str):
 
 def load_main_config() -> GlomWrapper:
     return load_config("config.toml")
-
@@ -1,7 +1,7 @@
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 import uuid
-from backend.infrastructure.config import load_main_config
+from backend.infrastructure.config import load_main_config, subscribe
 import importlib
 from typing import Optional, Tuple, List, Dict, Any
 from glom import glom, Coalesce
@@ -13,33 +13,41 @@ def load_class(path: str):
     module = importlib.import_module(module_name)
     return getattr(module, class_name)
 
-_cfg = load_main_config()
+def create_user_agent() -> str:
+    return f"Ubiquite instance {uuid.uuid4()} edoigtrd/ubiquite"
 
-_NOMINATIM = _cfg.get("nominatim.url")
 
+_GEOCODER: Tuple[Any, Any] | None = None
+
+
+def get_geocoder() -> Tuple[Any, Any]:
+    """Rate limited (geocode, reverse) of the configured geocoder, rebuilt when the config changes."""
+    global _GEOCODER
+    if _GEOCODER is None:
+        # Copied, the config snapshot is shared
+        params = dict(load_main_config().get("nominatim", {"url": "nominatim.openstreetmap.org"}))
+        ratelimiter_params = params.pop("ratelimiter", {})
+        cls = load_class(params.pop("cls")) if "cls" in params else Nominatim
+        if not 'user_agent' in params:
+            params['user_agent'] = create_user_agent()
+        geocoder = cls(**params)
+        _GEOCODER = (RateLimiter(geocoder.geocode, **ratelimiter_params), RateLimiter(geocoder.reverse, **ratelimiter_params))
+    return _GEOCODER
 
-def create_user_agent() -> str:
-    return f"Ubiquite instance {uuid.uuid4()} edoigtrd/ubiquite"
 
-_NOMINATIM_PARAMS = _cfg.get("nominatim", {"url":"nominatim.openstreetmap.org" })
+@subscribe
+def _reset_geocoder(_cfg) -> None:
+    global _GEOCODER
+    _GEOCODER = None
+    reverse_geocode_city.cache_clear()
 
-if 'ratelimiter' in _NOMINATIM_PARAMS:
-    _RATELIMITER_PARAMS = _NOMINATIM_PARAMS['ratelimiter']
-    del _NOMINATIM_PARAMS['ratelimiter']
 
-if 'cls' in _NOMINATIM_PARAMS:
-    cls_path = _NOMINATIM_PARAMS['cls']
-    cls = load_class(cls_path)
-    del _NOMINATIM_PARAMS['cls']
-else:
-    cls = Nominatim
+def geocode(*args, **kwargs):
+    return get_geocoder()[0](*args, **kwargs)
 
-if not 'user_agent' in _NOMINATIM_PARAMS:
-    _NOMINATIM_PARAMS['user_agent'] = create_user_agent()
 
-geocoder = cls(**_NOMINATIM_PARAMS)
-geocode = RateLimiter(geocoder.geocode, **_RATELIMITER_PARAMS)
-reverse = RateLimiter(geocoder.reverse, **_RATELIMITER_PARAMS)
+def reverse(*args, **kwargs):
+    return get_geocoder()[1](*args, **kwargs)
 
 
 def geocode_address(address: str):
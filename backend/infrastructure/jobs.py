@@ -0,0 +1,120 @@
+"""Background jobs run on the event loop, off the answer's critical path.
+
+Each named queue has its own concurrency limit, per-attempt timeout and retry policy,
+configured under [server.jobs.<name>], and every queue shares the server.jobs.max_workers
+pool. Keyed jobs (one per message uuid) are deduplicated while queued or running and
+their state is persisted, so jobs interrupted by a restart are picked up again.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from backend.infrastructure import persistence_async as adb
+from backend.infrastructure.config import load_main_config
+from backend.infrastructure.persistence import JobStatus
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_CONCURRENCY = 2
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+
+
+class JobQueue:
+    def __init__(
+        self,
+        name: str,
+        workers: asyncio.Semaphore,
+        handler: Callable[[str], Awaitable[Any]] | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+    ) -> None:
+        self.name = name
+        self.workers = workers
+        self.handler = handler
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # Keeps running jobs referenced, the loop only holds weak references to tasks
+        self.tasks: Set[asyncio.Task] = set()
+        self.running: Dict[str, asyncio.Task] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self.tasks)
+
+    def submit(self, job: Callable[[], Awaitable[Any]], key: str | None = None) -> asyncio.Task:
+        """Schedule `job`, the task resolves to its result, or None once every attempt failed."""
+        task = asyncio.create_task(self._run(job, key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def enqueue(self, key: str) -> asyncio.Task:
+        """Run the queue's handler for `key`, or join the job already queued or running for it.
+
+        Await the task through asyncio.shield, cancelling a waiter mustn't cancel the job.
+        """
+        task = self.running.get(key)
+        if task is None:
+            task = self.submit(lambda: self.handler(key), key)
+            self.running[key] = task
+            task.add_done_callback(lambda _: self.running.pop(key, None))
+        return task
+
+    async def _run(self, job: Callable[[], Awaitable[Any]], key: str | None) -> Any:
+        if key is not None:
+            await adb.set_job_state(self.name, key, JobStatus.QUEUED)
+        async with self.semaphore, self.workers:
+            for attempt in range(self.retries + 1):
+                if key is not None:
+                    await adb.set_job_state(self.name, key, JobStatus.RUNNING)
+                try:
+                    result = await asyncio.wait_for(job(), timeout=self.timeout)
+                except Exception as e:
+                    if attempt == self.retries:
+                        print(f"{self.name} job failed after {attempt + 1} attempts: {e!r}")
+                        if key is not None:
+                            await adb.set_job_state(self.name, key, JobStatus.FAILED, repr(e))
+                        return None
+                    await asyncio.sleep(self.backoff * 2 ** attempt)
+                    continue
+                if key is not None:
+                    await adb.set_job_state(self.name, key, JobStatus.DONE)
+                return result
+
+
+JOB_QUEUES: Dict[str, JobQueue] = {}
+WORKERS: asyncio.Semaphore | None = None
+
+
+def get_job_queue(name: str, handler: Callable[[str], Awaitable[Any]] | None = None) -> JobQueue:
+    global WORKERS
+    if WORKERS is None:
+        WORKERS = asyncio.Semaphore(load_main_config().get("server.jobs.max_workers", DEFAULT_MAX_WORKERS))
+    if name not in JOB_QUEUES:
+        cfg = load_main_config().get(f"server.jobs.{name}", {})
+        JOB_QUEUES[name] = JobQueue(
+            name,
+            WORKERS,
+            concurrency=cfg.get("concurrency", DEFAULT_CONCURRENCY),
+            timeout=cfg.get("timeout", DEFAULT_TIMEOUT),
+            retries=cfg.get("retries", DEFAULT_RETRIES),
+            backoff=cfg.get("backoff", DEFAULT_BACKOFF),
+        )
+    if handler is not None:
+        JOB_QUEUES[name].handler = handler
+    return JOB_QUEUES[name]
+
+
+async def resume_unfinished_jobs() -> int:
+    """Enqueue the keyed jobs a previous process left queued or running, returns how many were."""
+    resumed = 0
+    for job in await adb.list_unfinished_jobs():
+        queue = JOB_QUEUES.get(job.kind)
+        if queue is not None and queue.handler is not None:
+            queue.enqueue(job.key)
+            resumed += 1
+    return resumed
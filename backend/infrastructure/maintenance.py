@@ -0,0 +1,40 @@
+"""Offline maintenance commands for the Ubiquite database.
+
+    python -m backend.infrastructure.maintenance rebuild-search
+    python -m backend.infrastructure.maintenance compact
+"""
+import argparse
+
+from backend.infrastructure.persistence import compact_database, get_engine
+from backend.infrastructure.search import rebuild_search_index
+
+
+def rebuild_search() -> None:
+    rebuild_search_index(get_engine())
+    print("Search index rebuilt")
+
+
+def compact() -> None:
+    report = compact_database()
+    reclaimed = report.pop("reclaimed_bytes")
+    for table, count in report.items():
+        print(f"{table}: {count} stale rows removed")
+    if reclaimed is not None:
+        print(f"{reclaimed / 1024 / 1024:.2f} MiB reclaimed")
+
+
+COMMANDS = {
+    "rebuild-search": rebuild_search,
+    "compact": compact,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.infrastructure.maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,6 @@ from typing import Tuple, Dict
 from backend.infrastructure.config import load_main_config
 from backend.infrastructure.geo import reverse_geocode_city
 
-_cfg = load_main_config()
-_OPENMETEO = _cfg.get("widgets.weather.open_meteo_url")
-_ICON_BASE = _cfg.get("widgets.weather.icons_base_url")
 
 _session = requests.Session()
 _session.headers.update({"User-Agent": "edo-weather/1.0 (+contact@example.com)"})
@@ -21,7 +18,7 @@ def fetch_open_meteo(lat: float, lon: float) -> dict:
         "wind_speed_unit": "kmh",
         "timezone": "auto",
     }
-    r = _session.get(_OPENMETEO, params=params, timeout=10)
+    r = _session.get(load_main_config().get("widgets.weather.open_meteo_url"), params=params, timeout=10)
     r.raise_for_status()
     return r.json()
 
@@ -70,5 +67,5 @@ def get_weather_snapshot(lat: float, lon: float) -> dict:
         "wind_kmh": cur["wind_speed_10m"],
         "humidity_pct": cur["relative_humidity_2m"],
         "icon_slug": icon_slug,
-        "icon_url_hint": f"{_ICON_BASE}/{icon_slug}.svg",
+        "icon_url_hint": f"{load_main_config().get('widgets.weather.icons_base_url')}/{icon_slug}.svg",
     }
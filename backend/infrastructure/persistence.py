@@ -1,41 +1,257 @@
 from uuid import UUID
-from sqlmodel import Field, SQLModel, create_engine
+from sqlmodel import Field, SQLModel, create_engine, Index
+from sqlalchemy import BigInteger, Integer, Engine, TypeDecorator, bindparam, delete, event, inspect, literal, or_, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 from uuid import uuid4
 from datetime import datetime
 from enum import Enum
 from sqlmodel import Session, select
-from typing import List, Union, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Union, Tuple
+from contextlib import contextmanager
+from collections import OrderedDict
+from functools import partial
+import threading
+import time
 from backend.infrastructure.config import load_config
-from backend.infrastructure.utils import Role, remove_duplicates_cond
-import re
-from backend.application.url_tools import get_url_preview
+from backend.infrastructure.utils import Role, iso_to_micros, micros_to_iso
+import json
+import base64
+from backend.application.url_tools import NOT_FETCHED, SourcePreview, extract_urls, fallback_preview, get_url_preview, get_url_previews, normalize_url
 from backend.infrastructure.rerankers import ImageResult
+from backend.infrastructure.search import SearchPage, ensure_search_index, search_conversations as _search_conversations
 
 
 ENGINE = None
 
+# PRAGMAs applied to every new SQLite connection, overridable under [database.sqlite]
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 268435456,
+    "cache_size": -65536,
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,
+}
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle")
+
+
+def get_database_url() -> str:
+    return load_config().get("database.url", "sqlite:///database.db")
+
+
+def get_sqlite_pragmas() -> Dict[str, Any] | None:
+    cfg = load_config().get("database.sqlite", {})
+    if not cfg.get("tuning", True):
+        return None
+    overrides = {k: v for k, v in cfg.items() if k in SQLITE_PRAGMAS}
+    return SQLITE_PRAGMAS | overrides
+
+
+def get_engine_options(url: str) -> Dict[str, Any]:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return {k: v for k in POOL_OPTIONS if (v := load_config().get(f"database.{k}")) is not None}
+    if url.database in (None, "", ":memory:"):
+        # In-memory databases live in a single connection, keep SQLAlchemy's default pool
+        return {}
+    options = {k: v for k in POOL_OPTIONS if (v := load_config().get(f"database.{k}")) is not None}
+    options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items() if name in SQLITE_PRAGMAS]
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+
+
+def create_db_engine(url: str, sqlite_pragmas: Dict[str, Any] | None = None, **options) -> Engine:
+    engine = create_engine(url, echo=False, **options)
+    if sqlite_pragmas and engine.dialect.name == "sqlite":
+        apply_sqlite_pragmas(engine, sqlite_pragmas)
+    return engine
+
 
 def get_engine():
     global ENGINE
     if ENGINE is not None:
         return ENGINE
-    url = load_config().get("database.url", "sqlite:///database.db")
-    engine = create_engine(url, echo=False)
+    url = get_database_url()
+    engine = create_db_engine(url, get_sqlite_pragmas(), **get_engine_options(url))
     SQLModel.metadata.create_all(engine)
+    migrate_timestamps(engine)
+    if ("conversation", "active_leaf_uuid") in add_missing_columns(engine):
+        backfill_active_leaf(engine)
+    ensure_enum_values(engine)
+    ensure_indexes(engine)
+    ensure_search_index(engine)
     ENGINE = engine
     return engine
 
 
+# Columns stored as ISO strings before they moved to integer epoch microseconds
+TIMESTAMP_COLUMNS = {
+    "conversation": ["created_at", "updated_at"],
+    "message": ["timestamp"],
+}
+
+# Superseded by the (conversation_id, timestamp) index
+LEGACY_INDEXES = ["ix_message_conversation_id", "ix_conversation_updated_at"]
+
+
+def migrate_timestamps(engine: Engine) -> None:
+    inspector = inspect(engine)
+    pending = [
+        (table, column["name"])
+        for table, names in TIMESTAMP_COLUMNS.items() if inspector.has_table(table)
+        for column in inspector.get_columns(table)
+        if column["name"] in names and not isinstance(column["type"], Integer)
+    ]
+    if not pending:
+        return
+    print(f"Migrating timestamp columns to epoch microseconds: {pending}")
+    with engine.begin() as conn:
+        for index in LEGACY_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index}")
+        for table, column in pending:
+            if engine.dialect.name == "sqlite":
+                _migrate_sqlite_timestamp(conn, table, column)
+            else:
+                conn.exec_driver_sql(
+                    f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE BIGINT '
+                    f'USING (EXTRACT(EPOCH FROM "{column}"::timestamp) * 1000000)::bigint'
+                )
+
+
+def _migrate_sqlite_timestamp(conn, table: str, column: str) -> None:
+    # SQLite can't change a column type: copy into a new column, drop the old one and rename
+    for index in inspect(conn).get_indexes(table):
+        if column in index["column_names"]:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index['name']}")
+    tmp = f"{column}__us"
+    conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN "{tmp}" BIGINT')
+    rows = conn.exec_driver_sql(f'SELECT id, "{column}" FROM {table}').all()
+    conn.exec_driver_sql(
+        f'UPDATE {table} SET "{tmp}" = ? WHERE id = ?',
+        [(iso_to_micros(value) if isinstance(value, str) else value, id_) for id_, value in rows],
+    )
+    conn.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN "{column}"')
+    conn.exec_driver_sql(f'ALTER TABLE {table} RENAME COLUMN "{tmp}" TO "{column}"')
+
+
+# Columns added to existing tables, create_all only creates missing tables
+ADDED_COLUMNS = {
+    "conversation": {"active_leaf_uuid": "VARCHAR"},
+    "message": {"status": "VARCHAR(11) NOT NULL DEFAULT 'COMPLETE'"},
+}
+
+
+def add_missing_columns(engine: Engine) -> List[Tuple[str, str]]:
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for column, ddl in columns.items():
+                if column not in existing:
+                    print(f"Adding {table}.{column}")
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                    added.append((table, column))
+    return added
+
+
+def backfill_active_leaf(engine: Engine) -> None:
+    with engine.begin() as conn:
+        # Existing conversations point at the branch the root walk used to pick
+        roots = dict(conn.execute(
+            select(Message.conversation_id, Message.uuid)
+            .where(Message.parent_id.is_(None))
+            .order_by(Message.timestamp.desc(), Message.id.desc())
+        ).all())
+        leaves = {cid: conn.execute(_latest_leaf_statement(root)).scalar() for cid, root in roots.items()}
+        if leaves:
+            conn.execute(
+                update(Conversation).where(Conversation.id == bindparam("cid")).values(active_leaf_uuid=bindparam("leaf")),
+                [{"cid": cid, "leaf": leaf} for cid, leaf in leaves.items()],
+            )
+
+
+def ensure_enum_values(engine: Engine) -> None:
+    # PostgreSQL enum types created by an older schema don't get new members from create_all
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM pg_type WHERE typname = 'messagestatus'").first() is None:
+            return
+        for member in MessageStatus:
+            conn.exec_driver_sql(f"ALTER TYPE messagestatus ADD VALUE IF NOT EXISTS '{member.name}'")
+
+
+@contextmanager
+def unit_of_work() -> Iterator[Session]:
+    # One session, one transaction: committed on success, rolled back on error
+    with Session(get_engine(), expire_on_commit=False) as session:
+        with session.begin():
+            yield session
+
+
+def ensure_indexes(engine) -> None:
+    # create_all only emits indexes alongside new tables, existing databases need them added explicitly
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
 def now_iso() -> str:
     return datetime.utcnow().isoformat()
 
 
+class EpochMicros(TypeDecorator):
+    """Integer epoch microseconds in the database, ISO 8601 strings in Python."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        return iso_to_micros(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return micros_to_iso(value)
+
+
+def timestamp_field(**kwargs) -> Any:
+    return Field(default_factory=now_iso, sa_type=EpochMicros, **kwargs)
+
+
 class Conversation(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_conversation_updated_at_id", "updated_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     uuid: str = Field(default_factory=lambda: str(uuid4()), index=True, unique=True)
     title: str | None = None
-    created_at: str = Field(default_factory=now_iso)
-    updated_at: str = Field(default_factory=now_iso)
+    created_at: str = timestamp_field()
+    updated_at: str = timestamp_field()
+    # Tip of the branch shown to the user, moved by create_message and set_active_branch
+    active_leaf_uuid: str | None = None
 
 
 class ConversationDTO(SQLModel):
@@ -45,24 +261,53 @@ class ConversationDTO(SQLModel):
     title: str | None = None
     created_at: str
     updated_at: str
+    active_leaf_uuid: str | None = None
+
+
+class ConversationSummary(SQLModel):
+    id: int
+    uuid: str
+    title: str | None = None
+    updated_at: str
+
+
+class ConversationPage(SQLModel):
+    conversations: List[ConversationSummary]
+    next_cursor: str | None = None
+
+
+class MessageStatus(Enum):
+    # Partial answer checkpointed while it is being generated
+    STREAMING = "streaming"
+    COMPLETE = "complete"
+    # The client disconnected before the answer was finished
+    INTERRUPTED = "interrupted"
 
 
 class Message(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_message_parent_timestamp_id", "parent_id", "timestamp", "id"),
+        Index("ix_message_conversation_timestamp", "conversation_id", "timestamp"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     uuid: str = Field(default_factory=lambda: str(uuid4()), index=True, unique=True)
     conversation_id: int = Field(foreign_key="conversation.id")
     role: Role
     content: str
     thoughts : str | None = Field(default=None)
-    timestamp: str = Field(default_factory=now_iso)
+    timestamp: str = timestamp_field()
     parent_id: str | None = Field(default=None, foreign_key="message.uuid")
+    status: MessageStatus = Field(
+        default=MessageStatus.COMPLETE, sa_column_kwargs={"server_default": MessageStatus.COMPLETE.name}
+    )
 
 
 class Source(SQLModel, table=True):
     id : int | None = Field(default=None, primary_key=True)
     uuid: str = Field(default_factory=lambda: str(uuid4()), index=True, unique=True)
     message_id: int = Field(foreign_key="message.id")
-    message_uuid: str = Field(foreign_key="message.uuid")
+    message_uuid: str = Field(foreign_key="message.uuid", index=True)
     conversation_id : int | None = Field(default=None, nullable=True, foreign_key="conversation.id")
     title: str
     description: str | None = None
@@ -91,48 +336,280 @@ class Image(SQLModel, table=True) :
     url : str | None = None
     idx : int | None = Field(default=None, nullable=True)
 
-def save_message_images(
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class Job(SQLModel, table=True):
+    """State of a background job, one row per (kind, key) such as ("images", message uuid)."""
+    __table_args__ = (
+        Index("ix_job_kind_key", "kind", "key", unique=True),
+        Index("ix_job_status", "status"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    kind: str
+    key: str
+    status: JobStatus = Field(default=JobStatus.QUEUED)
+    attempts: int = 0
+    error: str | None = None
+    updated_at: str = timestamp_field()
+
+class PreviewCacheEntry(SQLModel, table=True):
+    url: str = Field(primary_key=True)
+    ok: bool = True
+    title: str | None = None
+    description: str | None = None
+    image: str | None = None
+    final_url: str | None = None
+    site_name: str | None = None
+    fetched_at: float = Field(default_factory=time.time)
+    expires_at: float = Field(index=True)
+
+    def to_preview(self) -> SourcePreview | None:
+        if not self.ok:
+            return None
+        return SourcePreview(
+            title=self.title,
+            description=self.description,
+            image=self.image,
+            url=self.final_url or self.url,
+            site_name=self.site_name,
+        )
+
+
+class PreviewCache:
+    """URL preview cache: in-memory LRU in front of the preview_cache_entry table.
+
+    Failed fetches are cached as None for `negative_ttl` seconds so dead links
+    aren't retried on every message. URLs the fetcher didn't get to (NOT_FETCHED,
+    or left out) come back as None but aren't cached. negative_hits counts the
+    cached failures served, a subset of memory_hits and db_hits.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, memory_entries: int) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory_entries = memory_entries
+        self._lru: OrderedDict[str, Tuple[float, SourcePreview | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "negative_hits": 0, "not_fetched": 0}
+
+    def _remember(self, url: str, expires_at: float, preview: SourcePreview | None) -> None:
+        self._lru[url] = (expires_at, preview)
+        self._lru.move_to_end(url)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(
+        self,
+        urls: List[str],
+        fetch: Callable[[List[str]], Dict[str, SourcePreview | None]],
+    ) -> Dict[str, SourcePreview | None]:
+        now = time.time()
+        found: Dict[str, SourcePreview | None] = {}
+        with self._lock:
+            for url in urls:
+                entry = self._lru.get(url)
+                if entry is not None and entry[0] > now:
+                    self._lru.move_to_end(url)
+                    found[url] = entry[1]
+                    self.stats["memory_hits"] += 1
+                    if entry[1] is None:
+                        self.stats["negative_hits"] += 1
+
+        missing = [url for url in urls if url not in found]
+        if missing:
+            with Session(get_engine()) as session:
+                statement = select(PreviewCacheEntry).where(
+                    PreviewCacheEntry.url.in_(missing), PreviewCacheEntry.expires_at > now
+                )
+                rows = session.exec(statement).all()
+            with self._lock:
+                for row in rows:
+                    found[row.url] = row.to_preview()
+                    self._remember(row.url, row.expires_at, found[row.url])
+                    self.stats["db_hits"] += 1
+                    if found[row.url] is None:
+                        self.stats["negative_hits"] += 1
+
+        missing = [url for url in urls if url not in found]
+        if missing:
+            fetched = fetch(missing)
+            entries = []
+            with self._lock:
+                for url in missing:
+                    preview = fetched.get(url, NOT_FETCHED)
+                    if preview is NOT_FETCHED:
+                        found[url] = None
+                        self.stats["not_fetched"] += 1
+                        continue
+                    expires_at = now + (self.ttl if preview is not None else self.negative_ttl)
+                    found[url] = preview
+                    self._remember(url, expires_at, preview)
+                    self.stats["misses"] += 1
+                    entries.append(PreviewCacheEntry(
+                        url=url,
+                        ok=preview is not None,
+                        title=preview.title if preview else None,
+                        description=preview.description if preview else None,
+                        image=preview.image if preview else None,
+                        final_url=preview.url if preview else None,
+                        site_name=preview.site_name if preview else None,
+                        fetched_at=now,
+                        expires_at=expires_at,
+                    ))
+            if entries:
+                with unit_of_work() as session:
+                    _upsert_preview_entries(session, entries)
+
+        return {url: found[url] for url in urls}
+
+    def get(self, url: str, fetch: Callable[[str], SourcePreview]) -> SourcePreview | None:
+        def fetch_many(missing: List[str]) -> Dict[str, SourcePreview | None]:
+            try:
+                return {missing[0]: fetch(missing[0])}
+            except Exception as e:
+                print(f"Error fetching preview for {missing[0]}: {e}")
+                return {missing[0]: None}
+
+        return self.get_many([url], fetch_many)[url]
+
+
+def _upsert_preview_entries(session: Session, entries: List[PreviewCacheEntry]) -> None:
+    # Concurrent misses on one URL both write it: insert or overwrite, never a plain INSERT
+    rows = {entry.url: entry.model_dump() for entry in entries}
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        statement = insert(PreviewCacheEntry).values([rows[url] for url in sorted(rows)])
+        statement = statement.on_conflict_do_update(
+            index_elements=["url"],
+            set_={column: statement.excluded[column] for column in next(iter(rows.values())) if column != "url"},
+        )
+        session.exec(statement)
+        return
+    for entry in entries:
+        try:
+            with session.begin_nested():
+                session.merge(entry)
+        except IntegrityError:
+            # Written by another worker meanwhile, as fresh as ours
+            pass
+
+
+PREVIEW_CACHE: PreviewCache | None = None
+
+
+def get_preview_cache() -> PreviewCache:
+    global PREVIEW_CACHE
+    if PREVIEW_CACHE is None:
+        cfg = load_config()
+        PREVIEW_CACHE = PreviewCache(
+            ttl=cfg.get("sources.cache.ttl", 7 * 24 * 3600),
+            negative_ttl=cfg.get("sources.cache.negative_ttl", 600),
+            memory_entries=cfg.get("sources.cache.memory_entries", 2048),
+        )
+    return PREVIEW_CACHE
+
+
+def get_cached_url_preview(url: str) -> SourcePreview | None:
+    return get_preview_cache().get(normalize_url(url), get_url_preview)
+
+
+def _save_message_images(
+    session: Session,
     images : List[ImageResult],
     message_uuid : str
 ) -> None:
-    message = get_message_by_uuid(message_uuid)
+    message = session.exec(select(Message).where(Message.uuid == message_uuid)).first()
     if message is None:
         raise ValueError("Message not found")
-    with Session(get_engine()) as session:
-        for idx, img in enumerate(images):
-            image_entry = Image(
-                message_id=message.id,
-                message_uuid=message.uuid,
-                conversation_id=message.conversation_id,
-                title=img.title,
-                source=img.source,
-                img=img.img,
-                url=img.url,
-                idx=idx
-            )
-            session.add(image_entry)
-        session.commit()
+    # Replaces the message's images, a retried or duplicated job mustn't add them twice
+    session.exec(delete(Image).where(Image.message_uuid == message.uuid))
+    for idx, img in enumerate(images):
+        image_entry = Image(
+            message_id=message.id,
+            message_uuid=message.uuid,
+            conversation_id=message.conversation_id,
+            title=img.title,
+            source=img.source,
+            img=img.img,
+            url=img.url,
+            idx=idx
+        )
+        session.add(image_entry)
+    session.flush()
 
-def retrieve_message_images(
+def save_message_images(
+    images : List[ImageResult],
+    message_uuid : str
+) -> None:
+    with unit_of_work() as session:
+        _save_message_images(session, images, message_uuid)
+
+def _retrieve_message_images(
+    session: Session,
     message_uuid : str
 ) -> List[dict]:
-    message = get_message_by_uuid(message_uuid)
+    message = session.exec(select(Message).where(Message.uuid == message_uuid)).first()
     if message is None:
         raise ValueError("Message not found")
-    
+
+    statement = select(Image).where(Image.message_uuid == message_uuid).order_by(Image.idx)
+    results = session.exec(statement).all()
+    images = [
+        ImageResult(
+            title=img.title,
+            url="",
+            source=img.source,
+            img=img.img
+        ).model_dump() | {"idx": idx}
+        for idx, img in enumerate(results)
+    ]
+    return images
+
+def retrieve_message_images(
+    message_uuid : str
+) -> List[dict]:
     with Session(get_engine()) as session:
-        statement = select(Image).where(Image.message_uuid == message_uuid).order_by(Image.idx)
-        results = session.exec(statement).all()
-        images = [
-            ImageResult(
-                title=img.title,
-                url="",
-                source=img.source,
-                img=img.img
-            ).model_dump() | {"idx": idx}
-            for idx, img in enumerate(results)
-        ]
-        return images
+        return _retrieve_message_images(session, message_uuid)
+
+def _set_job_state(session: Session, kind: str, key: str, status: JobStatus, error: str | None = None) -> None:
+    job = session.exec(select(Job).where(Job.kind == kind, Job.key == key)).first()
+    if job is None:
+        job = Job(kind=kind, key=key)
+    job.status = status
+    job.error = error
+    job.updated_at = now_iso()
+    if status is JobStatus.RUNNING:
+        job.attempts += 1
+    session.add(job)
+    session.flush()
+
+
+def set_job_state(kind: str, key: str, status: JobStatus, error: str | None = None) -> None:
+    with unit_of_work() as session:
+        _set_job_state(session, kind, key, status, error)
+
+
+def _job_status_statement(kind: str, key: str):
+    return select(Job.status).where(Job.kind == kind, Job.key == key)
+
+
+def _unfinished_jobs_statement():
+    # Left queued or running by a process that stopped before they were done
+    return select(Job).where(Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])).order_by(Job.id)
+
+
+def list_unfinished_jobs() -> List[Job]:
+    with Session(get_engine()) as session:
+        return session.exec(_unfinished_jobs_statement()).all()
+
 
 def create_conversation() -> Conversation:
     conv = Conversation(title=None)
@@ -165,24 +642,26 @@ def get_message_by_id(message_id: int) -> Message | None:
         result = session.exec(statement).first()
         return result
 
-def create_message(
+def _create_message(
+    session: Session,
     role: Role,
     content: str,
     parent: str | None = None,
     uuid: str | None = None,
-    thoughts: str | None = None
-) -> Tuple[Message, Conversation]:
+    thoughts: str | None = None,
+    status: MessageStatus = MessageStatus.COMPLETE,
+) -> Tuple[Message, ConversationDTO]:
 
     if parent is None or parent == 0:
         conversation = create_conversation()
-        conversation_id = conversation.id
+        session.add(conversation)
+        session.flush()
         parent_id = None
     else:
-        parent_msg = get_message_by_uuid(parent)
+        parent_msg = session.exec(select(Message).where(Message.uuid == parent)).first()
         if parent_msg is None:
             raise ValueError("Parent message not found")
-        conversation_id = parent_msg.conversation_id
-        conversation = get_conversation_by_id(conversation_id)
+        conversation = session.get(Conversation, parent_msg.conversation_id)
         if conversation is None:
             raise ValueError("Conversation not found")
         conversation.updated_at = now_iso()
@@ -194,27 +673,87 @@ def create_message(
     if isinstance(uuid, UUID):
         uuid = str(uuid)
 
+    # The new message becomes the active leaf in the same transaction as its insert
+    conversation.active_leaf_uuid = uuid
+    session.add(conversation)
+
     msg = Message(
-        conversation_id=conversation_id,
+        conversation_id=conversation.id,
         role=role,
         content=content,
         parent_id=parent_id,
         uuid=uuid,
         thoughts=thoughts,
+        status=status,
     )
-    with Session(get_engine()) as session:
-        if conversation.id is None:
-            session.add(conversation)
-            session.flush()
-            session.refresh(conversation)
-            msg.conversation_id = conversation.id
-        session.add(msg)
-        session.commit()
-        session.refresh(msg)
-        dto = ConversationDTO.model_validate(conversation, from_attributes=True)
+    session.add(msg)
+    session.flush()
+    dto = ConversationDTO.model_validate(conversation, from_attributes=True)
     return msg, dto
 
 
+def create_message(
+    role: Role,
+    content: str,
+    parent: str | None = None,
+    uuid: str | None = None,
+    thoughts: str | None = None
+) -> Tuple[Message, ConversationDTO]:
+    with unit_of_work() as session:
+        return _create_message(session, role, content, parent=parent, uuid=uuid, thoughts=thoughts)
+
+
+def save_assistant_message(
+    content: str,
+    parent: str,
+    uuid: str | None = None,
+    thoughts: str | None = None,
+    status: MessageStatus = MessageStatus.COMPLETE,
+) -> None:
+    """Insert the assistant message, or update the row an earlier checkpoint inserted.
+
+    Only STREAMING rows are updated: a checkpoint landing after the final write is a no-op.
+    """
+    uuid = str(uuid) if uuid is not None else str(uuid4())
+    with unit_of_work() as session:
+        row = session.execute(
+            update(Message)
+            .where(Message.uuid == uuid, Message.status == MessageStatus.STREAMING)
+            .values(content=content, thoughts=thoughts, status=status)
+            .returning(Message.id, Message.conversation_id)
+        ).first()
+        if row is None:
+            if session.exec(select(Message.id).where(Message.uuid == uuid)).first() is not None:
+                return
+            msg, _ = _create_message(session, Role.ASSISTANT, content, parent=parent, uuid=uuid, thoughts=thoughts, status=status)
+            row = (msg.id, msg.conversation_id)
+        if status is not MessageStatus.STREAMING:
+            # Message insert or update, conversation touch and map back-references commit together
+            _resolve_message_maps_references(session, uuid, *row)
+
+
+def _interrupt_streaming_messages(session: Session) -> int:
+    # Left STREAMING by a process that died mid-answer, no stream buffer can finish them anymore
+    rows = session.execute(
+        update(Message)
+        .where(Message.status == MessageStatus.STREAMING)
+        .values(status=MessageStatus.INTERRUPTED)
+        .returning(Message.uuid, Message.id, Message.conversation_id)
+    ).all()
+    for row in rows:
+        _resolve_message_maps_references(session, *row)
+    return len(rows)
+
+
+def interrupt_streaming_messages() -> int:
+    """Mark the answers a previous process left streaming as interrupted, returns how many were.
+
+    Run at startup, before any answer is generated: stream buffers live in the process.
+    """
+    with unit_of_work() as session:
+        return _interrupt_streaming_messages(session)
+
+
 def get_conversation_messages(conversation_id: int) -> List[Message]:
     with Session(get_engine()) as session:
         statement = select(Message).where(Message.conversation_id == conversation_id).order_by(Message.timestamp)
@@ -222,102 +761,106 @@ def get_conversation_messages(conversation_id: int) -> List[Message]:
         return results
 
 
-def get_conversation_chain_data(
-    chain_id: int, resolve_enum: bool = False
-) -> List[Tuple[Union[Role, str], str]]:
-    engine = get_engine()
-    with Session(engine) as session:
-        msgs = session.exec(
-            select(Message).where(Message.conversation_id == chain_id)
-        ).all()
-
-    if not msgs:
-        return []
+MAX_CHAIN_DEPTH = 10_000
 
-    uuids = {m.uuid for m in msgs}
-    orphans = [m for m in msgs if m.parent_id is not None and m.parent_id not in uuids]
-    assert not orphans, f"Found message(s) with missing parent in conversation {chain_id}: {[m.uuid for m in orphans]}"
 
-    roots = [m for m in msgs if m.parent_id is None]
-    assert len(roots) == 1, f"Expected exactly 1 root, found {len(roots)} in conversation {chain_id}"
-    root = roots[0]
+def _active_chain_statement(chain_id: int):
+    # Walk leaf -> root along parent_id from the conversation's active leaf, one indexed lookup per level
+    leaf_uuid = (
+        select(Conversation.active_leaf_uuid)
+        .where(Conversation.id == chain_id)
+        .scalar_subquery()
+    )
+    chain = (
+        select(Message.uuid.label("uuid"), Message.parent_id.label("parent_id"), literal(0).label("depth"))
+        .where(Message.uuid == leaf_uuid, Message.conversation_id == chain_id)
+        .cte("active_chain", recursive=True)
+    )
+    parent = aliased(Message)
+    chain = chain.union_all(
+        select(parent.uuid, parent.parent_id, chain.c.depth + 1)
+        .join(chain, parent.uuid == chain.c.parent_id)
+        .where(chain.c.depth < MAX_CHAIN_DEPTH)
+    )
+    return (
+        select(Message)
+        .join(chain, Message.uuid == chain.c.uuid)
+        .order_by(chain.c.depth.desc())
+    )
 
-    children_map = {}
-    for m in msgs:
-        if m.parent_id is not None:
-            children_map.setdefault(m.parent_id, []).append(m)
 
-    chain: List[Tuple[Union[Role, str], str]] = []
-    seen = set()
+def _latest_leaf_statement(message_uuid: str):
+    # Walk down from message_uuid following the most recent child at each level, return the last one
+    chain = (
+        select(literal(message_uuid).label("uuid"), literal(0).label("depth"))
+        .cte("latest_branch", recursive=True)
+    )
+    child = aliased(Message)
+    next_uuid = (
+        select(child.uuid)
+        .where(child.parent_id == chain.c.uuid)
+        .order_by(child.timestamp.desc(), child.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    chain = chain.union_all(
+        select(next_uuid, chain.c.depth + 1)
+        .where(chain.c.uuid.is_not(None), chain.c.depth < MAX_CHAIN_DEPTH)
+    )
+    return (
+        select(chain.c.uuid)
+        .where(chain.c.uuid.is_not(None))
+        .order_by(chain.c.depth.desc())
+        .limit(1)
+    )
 
-    cur = root
-    while True:
-        assert cur.uuid not in seen, f"Cycle detected at message {cur.uuid}"
-        seen.add(cur.uuid)
-        role_value = cur.role.value if resolve_enum else cur.role
-        chain.append((role_value, cur.content))
 
-        children = children_map.get(cur.uuid, [])
-        if not children:
-            break
+def _set_active_branch(session: Session, message_uuid: str) -> ConversationDTO:
+    message = session.exec(select(Message).where(Message.uuid == message_uuid)).first()
+    if message is None:
+        raise ValueError("Message not found")
+    conversation = session.get(Conversation, message.conversation_id)
+    if conversation is None:
+        raise ValueError("Conversation not found")
+    # Selecting an inner node shows the most recent continuation below it
+    conversation.active_leaf_uuid = session.exec(_latest_leaf_statement(message_uuid)).one()
+    session.add(conversation)
+    session.flush()
+    return ConversationDTO.model_validate(conversation, from_attributes=True)
 
-        children.sort(key=lambda x: (x.timestamp, x.id or 0), reverse=True)
-        cur = children[0]
 
-    return chain
+def set_active_branch(message_uuid: str) -> ConversationDTO:
+    with unit_of_work() as session:
+        return _set_active_branch(session, message_uuid)
 
 
 def get_conversation_chain_messages(chain_id: int) -> List[Message]:
-    engine = get_engine()
-    with Session(engine) as session:
-        msgs = session.exec(
-            select(Message).where(Message.conversation_id == chain_id)
-        ).all()
-
-    if not msgs:
-        return []
-
-    uuids = {m.uuid for m in msgs}
-    orphans = [m for m in msgs if m.parent_id is not None and m.parent_id not in uuids]
-    assert not orphans, f"Found message(s) with missing parent in conversation {chain_id}: {[m.uuid for m in orphans]}"
-
-    roots = [m for m in msgs if m.parent_id is None]
-    assert len(roots) == 1, f"Expected exactly 1 root, found {len(roots)} in conversation {chain_id}"
-    root = roots[0]
-
-    children_map = {}
-    for m in msgs:
-        if m.parent_id is not None:
-            children_map.setdefault(m.parent_id, []).append(m)
-
-    chain: List[Message] = []
-    seen = set()
+    with Session(get_engine()) as session:
+        return list(session.exec(_active_chain_statement(chain_id)).all())
 
-    cur = root
-    while True:
-        assert cur.uuid not in seen, f"Cycle detected at message {cur.uuid}"
-        seen.add(cur.uuid)
-        chain.append(cur)
 
-        children = children_map.get(cur.uuid, [])
-        if not children:
-            break
+def get_conversation_chain_data(
+    chain_id: int, resolve_enum: bool = False
+) -> List[Tuple[Union[Role, str], str]]:
+    return [
+        (m.role.value if resolve_enum else m.role, m.content)
+        for m in get_conversation_chain_messages(chain_id)
+    ]
 
-        children.sort(key=lambda x: (x.timestamp, x.id or 0), reverse=True)
-        cur = children[0]
 
-    return chain
+def _set_title(session: Session, conversation_id: int, title: str) -> None:
+    conversation = session.get(Conversation, conversation_id)
+    if conversation is None:
+        raise ValueError("Conversation not found")
+    conversation.title = title
+    conversation.updated_at = now_iso()
+    session.add(conversation)
+    session.flush()
 
 
 def set_title(conversation_id: int, title: str) -> None:
-    with Session(get_engine()) as session:
-        conversation = session.get(Conversation, conversation_id)
-        if conversation is None:
-            raise ValueError("Conversation not found")
-        conversation.title = title
-        conversation.updated_at = datetime.now().isoformat()
-        session.add(conversation)
-        session.commit()
+    with unit_of_work() as session:
+        _set_title(session, conversation_id, title)
 
 
 def list_conversations() -> List[ConversationDTO]:
@@ -327,38 +870,112 @@ def list_conversations() -> List[ConversationDTO]:
         dtos = [ConversationDTO.model_validate(c, from_attributes=True) for c in results]
         return dtos
 
+def _delete_conversation_by_uuid(session: Session, conversation_uuid: UUID) -> None:
+    conversation_id = session.exec(select(Conversation.id).where(Conversation.uuid == str(conversation_uuid))).first()
+    if conversation_id is None:
+        return
+    message_uuids = select(Message.uuid).where(Message.conversation_id == conversation_id)
+    # Attachments first, maps may not have their conversation_id resolved yet
+    session.exec(delete(Source).where(or_(Source.conversation_id == conversation_id, Source.message_uuid.in_(message_uuids))))
+    session.exec(delete(Map).where(or_(Map.conversation_id == conversation_id, Map.message_uuid.in_(message_uuids))))
+    session.exec(delete(Image).where(or_(Image.conversation_id == conversation_id, Image.message_uuid.in_(message_uuids))))
+    # Keyed jobs (sources, images) are keyed by message uuid
+    session.exec(delete(Job).where(Job.key.in_(message_uuids)))
+    session.exec(delete(Message).where(Message.conversation_id == conversation_id))
+    session.exec(delete(Conversation).where(Conversation.id == conversation_id))
+
 def delete_conversation_by_uuid(conversation_uuid: UUID) -> None:
+    with unit_of_work() as session:
+        _delete_conversation_by_uuid(session, conversation_uuid)
+
+def _purge_orphans(session: Session) -> Dict[str, int]:
+    conversation_ids = select(Conversation.id)
+    message_uuids = select(Message.uuid)
+    return {
+        "messages": session.exec(delete(Message).where(Message.conversation_id.not_in(conversation_ids))).rowcount,
+        "sources": session.exec(delete(Source).where(Source.message_uuid.not_in(message_uuids))).rowcount,
+        "maps": session.exec(delete(Map).where(or_(Map.message_uuid.is_(None), Map.message_uuid.not_in(message_uuids)))).rowcount,
+        "images": session.exec(delete(Image).where(or_(Image.message_uuid.is_(None), Image.message_uuid.not_in(message_uuids)))).rowcount,
+        "jobs": session.exec(delete(Job).where(Job.key.not_in(message_uuids))).rowcount,
+        "previews": session.exec(delete(PreviewCacheEntry).where(PreviewCacheEntry.expires_at <= time.time())).rowcount,
+    }
+
+def _database_size(engine: Engine) -> int | None:
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as conn:
+        page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+        page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+    return page_count * page_size
+
+def compact_database() -> Dict[str, int | None]:
+    # Maps are written before their message exists: run this while no answer is being generated
+    engine = get_engine()
+    size_before = _database_size(engine)
+    with unit_of_work() as session:
+        report = _purge_orphans(session)
+    if engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    size_after = _database_size(engine)
+    report["reclaimed_bytes"] = size_before - size_after if size_before is not None else None
+    return report
+
+def encode_cursor(updated_at: str, conversation_id: int) -> str:
+    raw = json.dumps([updated_at, conversation_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, conversation_id = json.loads(raw)
+        updated_at = str(updated_at)
+        # Checked here, a bad timestamp would otherwise only fail when the query binds it
+        iso_to_micros(updated_at)
+        return updated_at, int(conversation_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _conversation_page_statement(limit: int, cursor: str | None = None):
+    statement = select(Conversation.id, Conversation.uuid, Conversation.title, Conversation.updated_at)
+    if cursor is not None:
+        statement = statement.where(tuple_(Conversation.updated_at, Conversation.id) < decode_cursor(cursor))
+    # One extra row tells whether another page exists
+    return statement.order_by(Conversation.updated_at.desc(), Conversation.id.desc()).limit(limit + 1)
+
+def _conversation_page(rows, limit: int) -> ConversationPage:
+    conversations = [ConversationSummary(id=r.id, uuid=r.uuid, title=r.title, updated_at=r.updated_at) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = conversations[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    return ConversationPage(conversations=conversations, next_cursor=next_cursor)
+
+def list_conversations_page(limit: int = 50, cursor: str | None = None) -> ConversationPage:
     with Session(get_engine()) as session:
-        statement = select(Message).where(
-            Message.conversation_id == select(Conversation.id).where(Conversation.uuid == conversation_uuid).scalar_subquery())
-        results = session.exec(statement).all()
-        for msg in results:
-            session.delete(msg)
-        session.commit()
-
-    # remove sources
-
+        rows = session.exec(_conversation_page_statement(limit, cursor)).all()
+        return _conversation_page(rows, limit)
 
+def search_conversations(query: str, limit: int = 20, offset: int = 0, prefix: bool = False) -> SearchPage:
     with Session(get_engine()) as session:
-        statement = select(Conversation).where(Conversation.uuid == conversation_uuid)
-        result = session.exec(statement).first()
-        if result:
-            session.delete(result)
-            session.commit()
+        return _search_conversations(session, query, limit=limit, offset=offset, prefix=prefix)
 
 
 def create_source_pipeline(
-    message_uuid: Message
-) :
+    message_uuid: str
+) -> List[Source]:
     message = get_message_by_uuid(message_uuid)
     if message is None:
         raise ValueError("Message not found")
-    urls = re.findall(r'(https?:\/[^\s)]+)', message.content)
-    sources = []
-    sources = remove_duplicates_cond(sources, lambda a, b: a.url == b.url)
-    for url in urls:
-        preview = get_url_preview(url)
-        source = Source(
+    urls = extract_urls(message.content)
+    previews = get_preview_cache().get_many(urls, partial(
+        get_url_previews,
+        max_workers=load_config().get("sources.max_workers", 8),
+        deadline=load_config().get("sources.deadline", 10.0),
+    ))
+    previews = {url: preview or fallback_preview(url) for url, preview in previews.items()}
+    sources = [
+        Source(
             message_id=message.id,
             message_uuid=message.uuid,
             conversation_id=message.conversation_id,
@@ -368,11 +985,12 @@ def create_source_pipeline(
             url=preview.url,
             site_name=preview.site_name
         )
-        sources.append(source)
-        with Session(get_engine()) as session:
-            session.add(source)
-            session.commit()
-            session.refresh(source)
+        for url, preview in previews.items()
+    ]
+    with unit_of_work() as session:
+        # Replaces the message's sources, a retried or duplicated job mustn't add them twice
+        session.exec(delete(Source).where(Source.message_uuid == message.uuid))
+        session.add_all(sources)
     return sources
 
 def get_sources_by_message_uuid(message_uuid: str) -> List[Source]:
@@ -381,74 +999,78 @@ def get_sources_by_message_uuid(message_uuid: str) -> List[Source]:
         results = session.exec(statement).all()
         return results
 
-def create_map_entry(
-    message_uuid: str,
-    geojson_str: str
-) -> Map:
-
-    with Session(get_engine()) as session:
-        statement = select(Map).where(Map.message_uuid == message_uuid)
-        existing = session.exec(statement).all()
-        for emap in existing:
-            session.delete(emap)
-        session.commit()
-
+def _create_map_entry(session: Session, message_uuid: str, geojson_str: str) -> Map:
+    # Only the last map of a message is kept
+    session.exec(delete(Map).where(Map.message_uuid == message_uuid))
     map_entry = Map(
         message_uuid=message_uuid,
         geojson=geojson_str
     )
-    with Session(get_engine()) as session:
-        session.add(map_entry)
-        session.commit()
-        session.refresh(map_entry)
+    session.add(map_entry)
+    session.flush()
     return map_entry
 
+
+def create_map_entry(
+    message_uuid: str,
+    geojson_str: str
+) -> Map:
+    with unit_of_work() as session:
+        return _create_map_entry(session, message_uuid, geojson_str)
+
+def _resolve_message_maps_references(session: Session, message_uuid: str, message_id: int, conversation_id: int) -> None:
+    statement = (
+        update(Map)
+        .where(Map.message_uuid == message_uuid)
+        .values(message_id=message_id, conversation_id=conversation_id)
+    )
+    session.exec(statement)
+
 def resolve_message_maps_references(message_uuid: str) -> None :
-    print(f"Resolving map references for message UUID: {message_uuid}")
-    with Session(get_engine()) as session:
-        statement = select(Map).where(Map.message_uuid == message_uuid)
-        results = session.exec(statement).all()
-        for map_entry in results:
-            message = get_message_by_uuid(message_uuid)
-            if message is not None:
-                map_entry.message_id = message.id
-                map_entry.conversation_id = message.conversation_id
-                session.add(map_entry)
-        session.commit()
+    with unit_of_work() as session:
+        message = session.exec(select(Message).where(Message.uuid == message_uuid)).first()
+        if message is not None:
+            _resolve_message_maps_references(session, message.uuid, message.id, message.conversation_id)
+
+def resolve_map_attachments(session: Session, message_uuids: List[str]) -> Dict[str, dict]:
+    statement = select(Map).where(Map.message_uuid.in_(message_uuids)).order_by(Map.id)
+    attachments = {}
+    for result in session.exec(statement).all():
+        attachments.setdefault(result.message_uuid, {"type": "map", "content": result.geojson})
+    return attachments
 
-def resolve_message_attachments(message_uuid: str) -> List[dict] :
-    attachments = []
-    attachments_resolvers = [
-        resolve_map_attachment,
-        resolve_images_attachments
-    ]
-    for resolver in attachments_resolvers:
-        att = resolver(message_uuid)
-        if att :
-            attachments.append(att)
+def resolve_images_attachments(session: Session, message_uuids: List[str]) -> Dict[str, dict]:
+    statement = select(Image).where(Image.message_uuid.in_(message_uuids)).order_by(Image.idx)
+    grouped: Dict[str, List[dict]] = {}
+    for img in session.exec(statement).all():
+        grouped.setdefault(img.message_uuid, []).append({
+            "type": "image",
+            "content": img.img,
+            "title": img.title,
+            "url": img.url,
+            "source": img.source
+        })
+    return {uuid: {"type": "image", "content": images} for uuid, images in grouped.items()}
+
+# Each resolver fetches one attachment kind for a batch of messages: (session, uuids) -> {uuid: attachment}
+ATTACHMENT_RESOLVERS: List[Callable[[Session, List[str]], Dict[str, dict]]] = [
+    resolve_map_attachments,
+    resolve_images_attachments,
+]
+
+def _resolve_messages_attachments(session: Session, message_uuids: List[str]) -> Dict[str, List[dict]]:
+    attachments = {uuid: [] for uuid in message_uuids}
+    if not message_uuids:
+        return attachments
+    for resolver in ATTACHMENT_RESOLVERS:
+        for uuid, att in resolver(session, message_uuids).items():
+            if att:
+                attachments[uuid].append(att)
     return attachments
 
-def resolve_map_attachment(message_uuid: str) -> dict | None :
+def resolve_messages_attachments(message_uuids: List[str]) -> Dict[str, List[dict]]:
     with Session(get_engine()) as session:
-        statement = select(Map).where(Map.message_uuid == message_uuid)
-        result = session.exec(statement).first()
-        if result is None:
-            return None
-        return {"type":'map',"content": result.geojson}
+        return _resolve_messages_attachments(session, message_uuids)
 
-def resolve_images_attachments(message_uuid: str) -> dict | None :
-    attachments = []
-    with Session(get_engine()) as session:
-        statement = select(Image).where(Image.message_uuid == message_uuid).order_by(Image.idx)
-        results = session.exec(statement).all()
-        for img in results:
-            attachments.append({
-                "type":"image",
-                "content": img.img,
-                "title": img.title,
-                "url": img.url,
-                "source": img.source
-            })
-    if attachments:
-        return {"type": "image", "content": attachments}
-    return None
\ No newline at end of file
+def resolve_message_attachments(message_uuid: str) -> List[dict] :
+    return resolve_messages_attachments([message_uuid])[message_uuid]
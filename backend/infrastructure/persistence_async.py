@@ -0,0 +1,185 @@
+"""Async counterpart of backend.infrastructure.persistence for the FastAPI endpoints.
+
+Models, statements and session-level helpers are shared with the sync module; the
+sync functions stay available for tool code and callbacks running in worker threads.
+"""
+from typing import Dict, List, Tuple, Union
+from uuid import UUID
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.infrastructure import persistence as db
+from backend.infrastructure.persistence import (
+    Conversation,
+    ConversationDTO,
+    ConversationPage,
+    Job,
+    JobStatus,
+    Map,
+    Message,
+    Role,
+    Source,
+)
+from backend.infrastructure.rerankers import ImageResult
+from backend.infrastructure import search
+from backend.infrastructure.search import SearchPage
+
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+ASYNC_ENGINE: AsyncEngine | None = None
+SESSION_FACTORY: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def get_async_engine() -> AsyncEngine:
+    global ASYNC_ENGINE, SESSION_FACTORY
+    if ASYNC_ENGINE is not None:
+        return ASYNC_ENGINE
+    # Schema creation and migrations are handled by the sync engine
+    db.get_engine()
+    url = db.get_database_url()
+    engine = create_async_engine(get_async_url(url), echo=False, **db.get_engine_options(url))
+    pragmas = db.get_sqlite_pragmas()
+    if pragmas and engine.dialect.name == "sqlite":
+        db.apply_sqlite_pragmas(engine.sync_engine, pragmas)
+    ASYNC_ENGINE = engine
+    SESSION_FACTORY = async_sessionmaker(ASYNC_ENGINE, class_=AsyncSession, expire_on_commit=False)
+    return ASYNC_ENGINE
+
+
+def session() -> AsyncSession:
+    get_async_engine()
+    return SESSION_FACTORY()
+
+
+async def get_conversation_by_id(conversation_id: int) -> Conversation | None:
+    async with session() as s:
+        return await s.get(Conversation, conversation_id)
+
+
+async def get_conversation_by_uuid(conversation_uuid: str) -> Conversation | None:
+    async with session() as s:
+        statement = select(Conversation).where(Conversation.uuid == conversation_uuid)
+        return (await s.exec(statement)).first()
+
+
+async def get_message_by_uuid(message_uuid: str) -> Message | None:
+    async with session() as s:
+        statement = select(Message).where(Message.uuid == message_uuid)
+        return (await s.exec(statement)).first()
+
+
+async def create_message(
+    role: Role,
+    content: str,
+    parent: str | None = None,
+    uuid: str | None = None,
+    thoughts: str | None = None
+) -> Tuple[Message, ConversationDTO]:
+    async with session() as s, s.begin():
+        return await s.run_sync(db._create_message, role, content, parent, uuid, thoughts)
+
+
+async def get_conversation_chain_messages(chain_id: int) -> List[Message]:
+    async with session() as s:
+        return list((await s.exec(db._active_chain_statement(chain_id))).all())
+
+
+async def get_conversation_chain_data(
+    chain_id: int, resolve_enum: bool = False
+) -> List[Tuple[Union[Role, str], str]]:
+    return [
+        (m.role.value if resolve_enum else m.role, m.content)
+        for m in await get_conversation_chain_messages(chain_id)
+    ]
+
+
+async def set_active_branch(message_uuid: str) -> ConversationDTO:
+    async with session() as s, s.begin():
+        return await s.run_sync(db._set_active_branch, message_uuid)
+
+
+async def set_title(conversation_id: int, title: str) -> None:
+    async with session() as s, s.begin():
+        await s.run_sync(db._set_title, conversation_id, title)
+
+
+async def list_conversations() -> List[ConversationDTO]:
+    async with session() as s:
+        statement = select(Conversation).order_by(Conversation.updated_at.desc())
+        results = (await s.exec(statement)).all()
+        return [ConversationDTO.model_validate(c, from_attributes=True) for c in results]
+
+
+async def list_conversations_page(limit: int = 50, cursor: str | None = None) -> ConversationPage:
+    async with session() as s:
+        rows = (await s.exec(db._conversation_page_statement(limit, cursor))).all()
+        return db._conversation_page(rows, limit)
+
+
+async def search_conversations(query: str, limit: int = 20, offset: int = 0, prefix: bool = False) -> SearchPage:
+    async with session() as s:
+        return await s.run_sync(search.search_conversations, query, limit, offset, prefix)
+
+
+async def delete_conversation_by_uuid(conversation_uuid: UUID) -> None:
+    async with session() as s, s.begin():
+        await s.run_sync(db._delete_conversation_by_uuid, conversation_uuid)
+
+
+async def get_sources_by_message_uuid(message_uuid: str) -> List[Source]:
+    async with session() as s:
+        statement = select(Source).where(Source.message_uuid == message_uuid)
+        return list((await s.exec(statement)).all())
+
+
+async def create_map_entry(message_uuid: str, geojson_str: str) -> Map:
+    async with session() as s, s.begin():
+        return await s.run_sync(db._create_map_entry, message_uuid, geojson_str)
+
+
+async def save_message_images(images: List[ImageResult], message_uuid: str) -> None:
+    async with session() as s, s.begin():
+        await s.run_sync(db._save_message_images, images, message_uuid)
+
+
+async def retrieve_message_images(message_uuid: str) -> List[dict]:
+    async with session() as s:
+        return await s.run_sync(db._retrieve_message_images, message_uuid)
+
+
+async def resolve_messages_attachments(message_uuids: List[str]) -> Dict[str, List[dict]]:
+    async with session() as s:
+        return await s.run_sync(db._resolve_messages_attachments, message_uuids)
+
+
+async def set_job_state(kind: str, key: str, status: JobStatus, error: str | None = None) -> None:
+    async with session() as s, s.begin():
+        await s.run_sync(db._set_job_state, kind, key, status, error)
+
+
+async def get_job_status(kind: str, key: str) -> JobStatus | None:
+    async with session() as s:
+        return (await s.exec(db._job_status_statement(kind, key))).first()
+
+
+async def list_unfinished_jobs() -> List[Job]:
+    async with session() as s:
+        return list((await s.exec(db._unfinished_jobs_statement())).all())
+
+
+async def interrupt_streaming_messages() -> int:
+    async with session() as s, s.begin():
+        return await s.run_sync(db._interrupt_streaming_messages)
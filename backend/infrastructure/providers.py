@@ -1,6 +1,10 @@
 from importlib import import_module
 from typing import Tuple, Dict, Any, Type
+import json
+import threading
 from pydantic import BaseModel
+from langchain_core.language_models import BaseChatModel
+from backend.infrastructure.config import subscribe
 
 
 PROVIDERS = {
@@ -20,6 +24,11 @@ class ModelConfig(BaseModel):
     cls: Any
     model_preset: str | None = None
 
+    @property
+    def supports_async(self) -> bool:
+        # Without its own _agenerate/_astream, LangChain runs the sync client in a thread for ainvoke
+        return any(getattr(self.cls, name, None) is not getattr(BaseChatModel, name) for name in ("_agenerate", "_astream"))
+
     def dump(self) -> Dict[str, Any]:
         return {
             "provider_type": self.provider,
@@ -53,3 +62,56 @@ def get_model(cfg, model: str) -> ModelConfig:
         provider_instance=provider_name,
         model_preset=model,
     )
+
+
+class ClientRegistry:
+    """Provider clients shared across requests, with their HTTP connection pools.
+
+    Keyed by client class and constructor arguments, so presets pointing at the same
+    provider and model share one client. Callbacks are bound per request on top of it.
+    """
+
+    def __init__(self) -> None:
+        self.clients: Dict[Tuple[Type, str], BaseChatModel] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model: ModelConfig) -> BaseChatModel:
+        key = (model.cls, json.dumps(model.config, sort_keys=True, default=str))
+        with self.lock:
+            client = self.clients.get(key)
+            if client is None:
+                self.misses += 1
+                client = self.clients[key] = model.cls(streaming=True, **model.config)
+            else:
+                self.hits += 1
+            return client
+
+    def clear(self) -> None:
+        # Old clients stay usable by the requests holding them, their pools close once released
+        with self.lock:
+            self.clients.clear()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"clients": len(self.clients), "hits": self.hits, "misses": self.misses}
+
+
+CLIENT_REGISTRY = ClientRegistry()
+
+
+@subscribe
+def _clear_clients(_cfg) -> None:
+    # Providers' keys or endpoints may have changed
+    CLIENT_REGISTRY.clear()
+
+
+def get_client_registry() -> ClientRegistry:
+    return CLIENT_REGISTRY
+
+
+def create_client(cfg, model: ModelConfig) -> BaseChatModel:
+    if cfg.get("server.reuse_clients", True):
+        return get_client_registry().get(model)
+    return model.cls(streaming=True, **model.config)
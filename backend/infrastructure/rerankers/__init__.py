@@ -3,7 +3,7 @@ from abc import ABC, abstractmethod
 from typing import List
 from pydantic import BaseModel
 from typing import ClassVar, Dict, Type
-from backend.infrastructure.config import load_config
+from backend.infrastructure.config import load_config, subscribe
 
 
 class ImageResult(BaseModel):
@@ -22,6 +22,7 @@ class ImageReranker(ABC):
 
 class ImageRerankerRegistry:
     default_registry: ClassVar[ImageRerankerRegistry] | None = None
+    default_reranker: ClassVar[ImageReranker] | None = None
 
     def __init__(self) -> None:
         self.registry: Dict[str, Type[ImageReranker]] = {}
@@ -39,13 +40,21 @@ class ImageRerankerRegistry:
     
     @classmethod
     def get_default_reranker(cls) -> ImageReranker:
-        cfg = load_config()
-        reranker_name = cfg.get("images_search.reranker.class", "SizeReranker")
-        reranker_config = cfg.get("images_search.reranker.config", {})
-        reranker_cls = cls.get_default_registry().registry.get(reranker_name)
-        if reranker_cls is None:
-            raise ValueError(f"Reranker '{reranker_name}' not found in registry")
-        return reranker_cls(**reranker_config)
+        # Built once (CLIP loads its model weights) until the config changes
+        if cls.default_reranker is None:
+            cfg = load_config()
+            reranker_name = cfg.get("images_search.reranker.class", "SizeReranker")
+            reranker_config = cfg.get("images_search.reranker.config", {})
+            reranker_cls = cls.get_default_registry().registry.get(reranker_name)
+            if reranker_cls is None:
+                raise ValueError(f"Reranker '{reranker_name}' not found in registry")
+            cls.default_reranker = reranker_cls(**reranker_config)
+        return cls.default_reranker
+
+
+@subscribe
+def _reset_default_reranker(_cfg) -> None:
+    ImageRerankerRegistry.default_reranker = None
 
 # Dynamically import all modules in this package to register rerankers
 import importlib
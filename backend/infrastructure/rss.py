@@ -4,7 +4,8 @@ from pydantic import BaseModel
 from urllib.request import Request, urlopen
 from xml.etree import ElementTree as ET
 import functools
-from ..application.url_tools import get_url_preview, SourcePreview
+from ..application.url_tools import SourcePreview
+from .persistence import get_cached_url_preview
 
 class Article(BaseModel):
     title: str
@@ -54,11 +55,8 @@ def fetch_latest_article(url: str) -> Article:
             if enclosure is not None and enclosure.get("type", "").startswith("image/"):
                 image = enclosure.get("url")
         if not image:
-            try:
-                preview = get_url_preview(link)
-                image = preview.image
-            except Exception:
-                image = None
+            preview = get_cached_url_preview(link) if link else None
+            image = preview.image if preview else None
 
         return Article(title=title, link=link, description=desc, pub_date=pub, image=image)
 
@@ -0,0 +1,174 @@
+"""Full-text search over conversation history, backed by SQLite FTS5.
+
+Two external-content FTS5 tables index message.content and conversation.title.
+Triggers keep them in sync with every insert, update and delete, so the index is
+maintained incrementally by create_message and set_title. Results are ranked with
+bm25 among the most recent RANK_CANDIDATES matches, which keeps very common terms
+from scanning the whole history.
+
+Rebuild the index of an existing database with:
+    python -m backend.infrastructure.maintenance rebuild-search
+"""
+from typing import List
+
+from pydantic import BaseModel
+from sqlalchemy import Engine, text
+from sqlalchemy.orm import Session
+
+from backend.infrastructure.utils import micros_to_iso
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_TOKENS = 16
+RANK_CANDIDATES = 2000
+
+SEARCH_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+        content, content='message', content_rowid='id', tokenize='{TOKENIZER}'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_ai AFTER INSERT ON message BEGIN
+        INSERT INTO message_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_ad AFTER DELETE ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS message_fts_au AFTER UPDATE OF content ON message BEGIN
+        INSERT INTO message_fts(message_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO message_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS conversation_fts USING fts5(
+        title, content='conversation', content_rowid='id', tokenize='{TOKENIZER}'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS conversation_fts_ai AFTER INSERT ON conversation BEGIN
+        INSERT INTO conversation_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversation_fts_ad AFTER DELETE ON conversation BEGIN
+        INSERT INTO conversation_fts(conversation_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversation_fts_au AFTER UPDATE OF title ON conversation BEGIN
+        INSERT INTO conversation_fts(conversation_fts, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO conversation_fts(rowid, title) VALUES (new.id, new.title);
+    END""",
+]
+
+# bm25 ranking costs O(matches), so each side only ranks its most recent :candidates matches
+# (cheap rowid-ordered scan), and snippets are only built for the returned page.
+SEARCH_QUERY = f"""
+WITH message_hits AS (
+    SELECT rowid AS id, rank FROM message_fts
+    WHERE message_fts MATCH :query AND rowid >= (
+        SELECT coalesce(min(rowid), 0) FROM (
+            SELECT rowid FROM message_fts WHERE message_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+        )
+    )
+    ORDER BY rank LIMIT :window
+), title_hits AS (
+    SELECT rowid AS id, rank FROM conversation_fts
+    WHERE conversation_fts MATCH :query AND rowid >= (
+        SELECT coalesce(min(rowid), 0) FROM (
+            SELECT rowid FROM conversation_fts WHERE conversation_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+        )
+    )
+    ORDER BY rank LIMIT :window
+), page AS (
+    SELECT 'message' AS kind, m.conversation_id AS conversation_id, m.uuid AS message_uuid, h.id AS ref, h.rank AS rank
+    FROM message_hits h JOIN message m ON m.id = h.id
+    UNION ALL
+    SELECT 'title', h.id, NULL, h.id, h.rank FROM title_hits h
+    ORDER BY rank LIMIT :limit OFFSET :offset
+)
+SELECT p.kind, c.uuid AS conversation_uuid, c.title AS conversation_title, c.updated_at,
+       p.message_uuid, p.rank,
+       CASE p.kind
+           WHEN 'message' THEN (
+               SELECT snippet(message_fts, 0, :hl_start, :hl_end, '…', {SNIPPET_TOKENS})
+               FROM message_fts WHERE message_fts MATCH :query AND rowid = p.ref
+           )
+           ELSE (
+               SELECT highlight(conversation_fts, 0, :hl_start, :hl_end)
+               FROM conversation_fts WHERE conversation_fts MATCH :query AND rowid = p.ref
+           )
+       END AS snippet
+FROM page p JOIN conversation c ON c.id = p.conversation_id
+ORDER BY p.rank
+"""
+
+
+class SearchHit(BaseModel):
+    kind: str
+    conversation_uuid: str
+    conversation_title: str | None = None
+    updated_at: str
+    message_uuid: str | None = None
+    snippet: str | None = None
+    rank: float
+
+
+class SearchPage(BaseModel):
+    results: List[SearchHit]
+    next_offset: int | None = None
+
+
+def search_supported(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def ensure_search_index(engine: Engine) -> None:
+    if not search_supported(engine):
+        return
+    with engine.begin() as conn:
+        existed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_fts'"
+        ).first() is not None
+        for statement in SEARCH_SCHEMA:
+            conn.exec_driver_sql(statement)
+        if not existed:
+            # Index history written before the FTS tables existed
+            _rebuild(conn)
+
+
+def _rebuild(conn) -> None:
+    conn.exec_driver_sql("INSERT INTO message_fts(message_fts) VALUES ('rebuild')")
+    conn.exec_driver_sql("INSERT INTO conversation_fts(conversation_fts) VALUES ('rebuild')")
+    conn.exec_driver_sql("INSERT INTO message_fts(message_fts) VALUES ('optimize')")
+    conn.exec_driver_sql("INSERT INTO conversation_fts(conversation_fts) VALUES ('optimize')")
+
+
+def rebuild_search_index(engine: Engine) -> None:
+    if not search_supported(engine):
+        raise NotImplementedError("Full-text search requires SQLite FTS5")
+    with engine.begin() as conn:
+        for statement in SEARCH_SCHEMA:
+            conn.exec_driver_sql(statement)
+        _rebuild(conn)
+
+
+def build_match_query(query: str, prefix: bool = False) -> str:
+    # Quote every term so user input can't use (or break) the FTS5 query syntax
+    terms = [t.replace('"', '""') for t in query.split()]
+    if not terms:
+        raise ValueError("Empty search query")
+    quoted = [f'"{t}"' for t in terms]
+    if prefix:
+        # Prefix queries merge every matching term's doclist, only use them for search-as-you-type
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_conversations(session: Session, query: str, limit: int = 20, offset: int = 0, prefix: bool = False) -> SearchPage:
+    if not search_supported(session.get_bind()):
+        raise NotImplementedError("Full-text search requires SQLite FTS5")
+    params = {
+        "query": build_match_query(query, prefix=prefix),
+        "hl_start": HIGHLIGHT_START,
+        "hl_end": HIGHLIGHT_END,
+        "candidates": max(RANK_CANDIDATES, offset + limit + 1),
+        "window": offset + limit + 1,
+        "limit": limit + 1,
+        "offset": offset,
+    }
+    rows = session.execute(text(SEARCH_QUERY), params).mappings().all()
+    hits = [SearchHit(**dict(row, updated_at=micros_to_iso(row["updated_at"]))) for row in rows[:limit]]
+    return SearchPage(results=hits, next_offset=offset + limit if len(rows) > limit else None)
+
@@ -0,0 +1,218 @@
+"""Replay buffers for in-flight chat answers.
+
+Every /chat run is pumped into a StreamBuffer keyed by its response uuid, and HTTP
+responses are subscribers of that buffer. A client that lost its connection can
+reattach with /chat/resume and the last event id it saw, without rerunning the LLM,
+and any number of other clients (a second tab, another device) can follow the same
+run from its first event with /chat/subscribe.
+
+All buffers share one memory budget. Finished streams are kept for `ttl` seconds and
+are the first to go when the budget is exceeded; after that the oldest frames of the
+largest live stream are dropped, and replays from before them are refused.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Callable, Deque, Dict, Tuple
+
+from backend.infrastructure.callbacks import DEFAULT_HEARTBEAT, DONE_FRAME, HEARTBEAT_FRAME, OK_FRAME, encode_frame
+from backend.infrastructure.config import load_main_config
+
+DEFAULT_BUDGET_MB = 64
+DEFAULT_TTL = 300.0
+DEFAULT_RESUME_GRACE = 30.0
+OVERRUN_FRAME = encode_frame({"event": "error", "data": "Replay buffer overrun, reload the conversation"})
+
+
+class StreamBuffer:
+    def __init__(
+        self, registry: "StreamRegistry", response_uuid: str, conversation_id: int | None = None, query_uuid: str | None = None
+    ) -> None:
+        self.registry = registry
+        self.response_uuid = response_uuid
+        self.conversation_id = conversation_id
+        self.query_uuid = query_uuid
+        # (event id, encoded frame); frames without an id before the end (prelude) take the previous one
+        self.frames: Deque[Tuple[int, bytes]] = deque()
+        self.first_pos = 0
+        self.size = 0
+        self.last_id = -1
+        self.dropped_through: int | None = None
+        self.finished_at: float | None = None
+        # Position of "done" among the frames, late events come after it
+        self.done_pos: int | None = None
+        # Events can still be appended after the run finished (late title), until close()
+        self.closed = False
+        self.subscribers = 0
+        # Called when nobody listened for resume_grace seconds before the run finished
+        self.on_abandon: Callable[[], None] | None = None
+        self._abandon_timer: asyncio.TimerHandle | None = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def append(self, payload: dict) -> None:
+        if "id" not in payload and self.finished:
+            # Late events (title) get the next id, or resuming after the last token would skip them
+            payload = payload | {"id": self.last_id + 1}
+        self.last_id = payload.get("id", self.last_id)
+        frame = encode_frame(payload)
+        self.frames.append((self.last_id, frame))
+        self.size += len(frame)
+        self._notify()
+        if self.registry.streams.get(self.response_uuid) is self:
+            # An evicted buffer (late title) isn't counted in the budget anymore
+            self.registry.grow(len(frame))
+
+    def finish(self) -> None:
+        self.finished_at = time.monotonic()
+        self.done_pos = self.first_pos + len(self.frames)
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+        self._notify()
+        self.registry.finished(self)
+
+    def close(self) -> None:
+        self.closed = True
+        self._notify()
+
+    def drop_oldest(self) -> int:
+        event_id, frame = self.frames.popleft()
+        self.first_pos += 1
+        self.dropped_through = event_id
+        self.size -= len(frame)
+        return len(frame)
+
+    def can_replay(self, after: int | None) -> bool:
+        return self.dropped_through is None or (after is not None and after >= self.dropped_through)
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.finished and self.on_abandon is not None:
+            loop = asyncio.get_running_loop()
+            self._abandon_timer = loop.call_later(self.registry.resume_grace, self._abandon)
+
+    def _abandon(self) -> None:
+        if self.subscribers == 0 and not self.finished and self.on_abandon is not None:
+            self.on_abandon()
+
+    async def subscribe(self, after: int | None = None, heartbeat: float = DEFAULT_HEARTBEAT) -> AsyncIterator[bytes]:
+        """Every frame (or those with an id greater than `after`), then live ones until the buffer is closed.
+
+        "done" is sent where the run finished, late events follow it, replays included.
+        """
+        self._attach()
+        try:
+            yield OK_FRAME
+            cursor = self.first_pos
+            if after is not None:
+                cursor += sum(1 for event_id, _ in self.frames if event_id <= after)
+            # Resuming after a late event: "done" came before it
+            done_sent = self.done_pos is not None and cursor > self.done_pos
+            while True:
+                changed = self._changed
+                if cursor < self.first_pos:
+                    # Fell behind the budget while reading: the missing frames are gone
+                    yield OVERRUN_FRAME
+                    return
+                while cursor < self.first_pos + len(self.frames):
+                    if not done_sent and self.done_pos is not None and cursor >= self.done_pos:
+                        yield DONE_FRAME
+                        done_sent = True
+                    yield self.frames[cursor - self.first_pos][1]
+                    cursor += 1
+                if self.finished and not done_sent:
+                    yield DONE_FRAME
+                    done_sent = True
+                if self.closed:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # Only sent when nothing else was, to keep idle proxies from closing the connection
+                    yield HEARTBEAT_FRAME
+        finally:
+            self._detach()
+
+
+class StreamRegistry:
+    def __init__(self, budget: int, ttl: float, resume_grace: float) -> None:
+        self.budget = budget
+        self.ttl = ttl
+        self.resume_grace = resume_grace
+        self.streams: Dict[str, StreamBuffer] = {}
+        self._finished: OrderedDict[str, StreamBuffer] = OrderedDict()
+        self.size = 0
+
+    def open(self, response_uuid: str, conversation_id: int | None = None, query_uuid: str | None = None) -> StreamBuffer:
+        self.evict_expired()
+        buffer = StreamBuffer(self, response_uuid, conversation_id, query_uuid)
+        self.streams[response_uuid] = buffer
+        return buffer
+
+    def get(self, response_uuid: str) -> StreamBuffer | None:
+        self.evict_expired()
+        return self.streams.get(response_uuid)
+
+    def live(self, conversation_id: int) -> list[StreamBuffer]:
+        """Runs of a conversation that are still generating, oldest first."""
+        return [b for b in self.streams.values() if b.conversation_id == conversation_id and not b.finished]
+
+    def grow(self, size: int) -> None:
+        self.size += size
+        if self.size > self.budget:
+            self._reclaim()
+
+    def finished(self, buffer: StreamBuffer) -> None:
+        self._finished[buffer.response_uuid] = buffer
+        self.evict_expired()
+
+    def evict_expired(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        while self._finished:
+            buffer = next(iter(self._finished.values()))
+            if buffer.finished_at > deadline:
+                break
+            self._remove(buffer)
+
+    def _remove(self, buffer: StreamBuffer) -> None:
+        # Subscribers still reading it keep their reference
+        self.streams.pop(buffer.response_uuid, None)
+        self._finished.pop(buffer.response_uuid, None)
+        self.size -= buffer.size
+
+    def _reclaim(self) -> None:
+        while self.size > self.budget and self._finished:
+            self._remove(next(iter(self._finished.values())))
+        while self.size > self.budget:
+            largest = max(self.streams.values(), key=lambda b: b.size, default=None)
+            if largest is None or not largest.frames:
+                break
+            self.size -= largest.drop_oldest()
+
+
+STREAM_REGISTRY: StreamRegistry | None = None
+
+
+def get_stream_registry() -> StreamRegistry:
+    global STREAM_REGISTRY
+    if STREAM_REGISTRY is None:
+        cfg = load_main_config()
+        STREAM_REGISTRY = StreamRegistry(
+            budget=int(cfg.get("server.stream.replay_budget_mb", DEFAULT_BUDGET_MB) * 1024 * 1024),
+            ttl=cfg.get("server.stream.replay_ttl", DEFAULT_TTL),
+            resume_grace=cfg.get("server.stream.resume_grace", DEFAULT_RESUME_GRACE),
+        )
+    return STREAM_REGISTRY
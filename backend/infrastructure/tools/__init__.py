@@ -1,16 +1,17 @@
 from langchain.tools import StructuredTool
 
-from .searx import search_searx, SearchInput
-from .url_fetch import retrieve_url, RetrieveUrlInput
+from .searx import search_searx, asearch_searx, SearchInput
+from .url_fetch import retrieve_url, aretrieve_url, RetrieveUrlInput
 from .math import math, MathInput
-from .map import create_map, MapCreationInput
-from .utils import FailsafeWrapper
+from .map import create_map, acreate_map, MapCreationInput
+from .utils import FailsafeWrapper, AsyncFailsafeWrapper
 from ..utils import s
 
 
 def build_tools(ctx):
     search_tool = StructuredTool.from_function(
         func=FailsafeWrapper(search_searx, ctx),
+        coroutine=AsyncFailsafeWrapper(asearch_searx, ctx),
         name="search_searx",
         description="Search Searx. THIS TOOL USAGE IS MANDATORY",
         args_schema=SearchInput,
@@ -18,6 +19,7 @@ def build_tools(ctx):
 
     fetch_url_tool = StructuredTool.from_function(
         func=FailsafeWrapper(retrieve_url, ctx),
+        coroutine=AsyncFailsafeWrapper(aretrieve_url, ctx),
         name="fetch_url",
         description="Fetch a URL and convert its HTML content to Markdown.",
         args_schema=RetrieveUrlInput,
@@ -32,6 +34,7 @@ def build_tools(ctx):
 
     map_tool = StructuredTool.from_function(
         func=FailsafeWrapper(create_map, ctx),
+        coroutine=AsyncFailsafeWrapper(acreate_map, ctx),
         name="create_map",
         description=s(
             "Create a map with given points (latitude, longitude, name, description, url).",
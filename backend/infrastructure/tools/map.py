@@ -3,8 +3,13 @@ from typing import List, Union, Annotated, Literal, Optional
 from pydantic import BaseModel, Field, model_validator
 from backend.infrastructure.geo import geocode_address
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
 import geojson
 from backend.infrastructure.persistence import create_map_entry
+from backend.infrastructure import persistence_async as adb
+
+# keep polite to Nominatim; adjust if you self-host
+GEOCODING_CONCURRENCY = 4
 
 def _resolve_nominatim_point(p: NominatimPoint) -> LatLonPoint:
     coords = geocode_address(p.nominatim_query)
@@ -19,7 +24,7 @@ def _resolve_nominatim_point(p: NominatimPoint) -> LatLonPoint:
         url=p.url,
     )
 
-def create_map(ctx, points: List[Union[LatLonPoint, NominatimPoint]]) -> str:
+def _split_points(points: List[Union[LatLonPoint, NominatimPoint]]):
     resolved: List[Optional[LatLonPoint]] = [None] * len(points)
     to_resolve: dict = {}
 
@@ -31,20 +36,10 @@ def create_map(ctx, points: List[Union[LatLonPoint, NominatimPoint]]) -> str:
             to_resolve[i] = p
         else:
             raise TypeError(f"Unsupported point type at index {i}: {type(p)}")
+    return resolved, to_resolve
 
-    # Parallel geocoding
-    errors: list[str] = []
-    if to_resolve:
-        max_workers = 4  # keep polite to Nominatim; adjust if you self-host
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            future_map = {ex.submit(_resolve_nominatim_point, p): i for i, p in to_resolve.items()}
-            for fut in as_completed(future_map):
-                idx = future_map[fut]
-                try:
-                    resolved[idx] = fut.result()
-                except Exception as e:
-                    errors.append(f"index={idx} query={to_resolve[idx].nominatim_query} error={e}")
 
+def _feature_collection(resolved: List[Optional[LatLonPoint]], errors: list[str]) -> str:
     if errors:
         # You can choose to log instead of raising
         raise RuntimeError("Some points failed to geocode:\n" + "\n".join(errors))
@@ -64,10 +59,49 @@ def create_map(ctx, points: List[Union[LatLonPoint, NominatimPoint]]) -> str:
         features.append(feature)
 
     fc = geojson.FeatureCollection(features)
-    geojson_str = geojson.dumps(fc, indent=2)
+    return geojson.dumps(fc, indent=2)
+
+
+def create_map(ctx, points: List[Union[LatLonPoint, NominatimPoint]]) -> str:
+    resolved, to_resolve = _split_points(points)
+
+    # Parallel geocoding
+    errors: list[str] = []
+    if to_resolve:
+        with ThreadPoolExecutor(max_workers=GEOCODING_CONCURRENCY) as ex:
+            future_map = {ex.submit(_resolve_nominatim_point, p): i for i, p in to_resolve.items()}
+            for fut in as_completed(future_map):
+                idx = future_map[fut]
+                try:
+                    resolved[idx] = fut.result()
+                except Exception as e:
+                    errors.append(f"index={idx} query={to_resolve[idx].nominatim_query} error={e}")
 
+    geojson_str = _feature_collection(resolved, errors)
     create_map_entry(str(ctx.current_message_id), geojson_str)
+    return geojson_str
+
+
+async def acreate_map(ctx, points: List[Union[LatLonPoint, NominatimPoint]]) -> str:
+    resolved, to_resolve = _split_points(points)
+
+    # geopy geocoders are blocking (and rate limited), run them in threads with the same concurrency
+    semaphore = asyncio.Semaphore(GEOCODING_CONCURRENCY)
+
+    async def resolve(p: NominatimPoint) -> LatLonPoint:
+        async with semaphore:
+            return await asyncio.to_thread(_resolve_nominatim_point, p)
+
+    errors: list[str] = []
+    results = await asyncio.gather(*(resolve(p) for p in to_resolve.values()), return_exceptions=True)
+    for (idx, p), result in zip(to_resolve.items(), results):
+        if isinstance(result, Exception):
+            errors.append(f"index={idx} query={p.nominatim_query} error={result}")
+        else:
+            resolved[idx] = result
 
+    geojson_str = _feature_collection(resolved, errors)
+    await adb.create_map_entry(str(ctx.current_message_id), geojson_str)
     return geojson_str
 
 
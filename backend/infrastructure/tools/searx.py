@@ -1,4 +1,5 @@
 from typing import List, Dict
+import httpx
 import requests
 import stealth_requests
 from pydantic import BaseModel, Field
@@ -8,22 +9,39 @@ from backend.infrastructure.utils import convert_to_markdown, convert_to_yaml
 from backend.infrastructure.config import load_config, load_main_config
 from sympy import sympify, SympifyError
 
+DEFAULT_TIMEOUT = 30.0
 
-def search_searx(ctx, query: str, language: str) -> List[Dict[str, str]]:
-    url = ctx.cfg("searx.endpoint")
-    verify = load_config().get("searx.verify", True)
 
+def _searx_params(ctx, query: str, language: str) -> Dict[str, str]:
     focus_cond = load_main_config().get("focuses.{}.cond".format(ctx.focus)) if ctx.focus else None
     focus_str = " OR ".join(focus_cond) if focus_cond else None
     q = "{} {}".format(focus_str, query) if focus_str else query
-    
-    response = requests.get(url, params={
+    return {
         "q": q,
         "language": language if language is not None else "en-us",
         "format": "json",
-    }, verify=verify)
-    
-    data = response.json()
+    }
+
+
+def search_searx(ctx, query: str, language: str) -> List[Dict[str, str]]:
+    url = ctx.cfg("searx.endpoint")
+    verify = load_config().get("searx.verify", True)
+    timeout = load_config().get("searx.timeout", DEFAULT_TIMEOUT)
+    response = requests.get(url, params=_searx_params(ctx, query, language), verify=verify, timeout=timeout)
+    return _parse_results(response.json())
+
+
+async def asearch_searx(ctx, query: str, language: str) -> List[Dict[str, str]]:
+    url = ctx.cfg("searx.endpoint")
+    verify = load_config().get("searx.verify", True)
+    # Same timeout as the sync path, httpx would otherwise apply its own 5s default
+    timeout = load_config().get("searx.timeout", DEFAULT_TIMEOUT)
+    async with httpx.AsyncClient(verify=verify, follow_redirects=True, timeout=timeout) as client:
+        response = await client.get(url, params=_searx_params(ctx, query, language))
+    return _parse_results(response.json())
+
+
+def _parse_results(data: dict) -> List[Dict[str, str]]:
     results = []
     for result in data.get("results", []):
         results.append({
@@ -1,3 +1,4 @@
+import asyncio
 import stealth_requests
 from typing import Optional
 from pydantic import BaseModel, Field, ConfigDict
@@ -11,6 +12,22 @@ def retrieve_url(url: Optional[str] = None, *args, **kwargs) -> str:
         return "error: missing 'url' for fetch_url"
 
     response = stealth_requests.get(url)
+    return _to_markdown(response)
+
+
+async def aretrieve_url(url: Optional[str] = None, *args, **kwargs) -> str:
+    if not url:
+        print("The model attempted to do a silly thing: fetch a URL without providing one.")
+        print(url, args, kwargs)
+        return "error: missing 'url' for fetch_url"
+
+    async with stealth_requests.AsyncStealthSession() as session:
+        response = await session.get(url)
+    # HTML parsing and markdown conversion are CPU-bound, keep them off the event loop
+    return await asyncio.to_thread(_to_markdown, response)
+
+
+def _to_markdown(response) -> str:
     document = response.text
     document = strip_doc(document)
     if response.status_code == 200:
@@ -16,12 +16,16 @@ class FailsafeWrapper:
         self.kwargs = kwargs
         self.ctx = ctx
 
-    def __call__(self, *args, **kwargs):
+    def _bind(self, args, kwargs):
         # sum self.args and self.kwargs with args and kwargs
         args = self.args + args
         kwargs = {**self.kwargs, **kwargs}
         if "ctx" in self.func.__code__.co_varnames and self.ctx is not None:
             kwargs["ctx"] = self.ctx
+        return args, kwargs
+
+    def __call__(self, *args, **kwargs):
+        args, kwargs = self._bind(args, kwargs)
         try:
             return self.func(*args, **kwargs)
         except Exception as e:
@@ -29,6 +33,17 @@ class FailsafeWrapper:
                 "error": str(e)
             })
 
+
+class AsyncFailsafeWrapper(FailsafeWrapper):
+    async def __call__(self, *args, **kwargs):
+        args, kwargs = self._bind(args, kwargs)
+        try:
+            return await self.func(*args, **kwargs)
+        except Exception as e:
+            return convert_to_yaml({
+                "error": str(e)
+            })
+
 def strip_doc(html: str) -> str:
     doc = lhtml.fromstring(html)
 
@@ -10,6 +10,7 @@ from PIL import Image
 import io
 import requests
 from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 T = TypeVar("T")
 
@@ -60,6 +61,19 @@ def remove_duplicates_cond(lst: Iterable[T], eq: Callable[[T, T], bool]) -> List
 
     return [lst[i] for i in uniques_idx]
 
+EPOCH = datetime(1970, 1, 1)
+
+def iso_to_micros(value: str) -> int:
+    # Exact integer arithmetic, naive timestamps are UTC
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def micros_to_iso(value: int) -> str:
+    return (EPOCH + timedelta(microseconds=value)).isoformat()
+
 def s(*lines: str) -> str:
     return "".join(lines)
 
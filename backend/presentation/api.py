@@ -1,4 +1,4 @@
-from typing import Any, List
+from typing import Any
 from uuid import UUID
 from fastapi import FastAPI, Response, Query, Body, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,18 +7,35 @@ from pathlib import Path
 import asyncio
 import json
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import uuid as uudid
 from functools import partial
 from backend.infrastructure.rss import fetch_latest_article_cached, Article
 
-from backend.infrastructure.config import load_config, config_check, load_main_config
+from backend.infrastructure.config import load_config, config_check, load_main_config, reload_config
 from backend.application.context import initialize_context
 from backend.application.agent import build_search_executor, build_title_executor
 from backend.infrastructure.meteo import get_weather_snapshot
 from backend.infrastructure.geo import reverse_geocode_city
-from backend.infrastructure.callbacks import StreamingCallbackHandler, BasicCallbackHandler, MessageOutput, LLMEndCallbackHandler
+from backend.infrastructure.callbacks import (
+    DEFAULT_CHECKPOINT_INTERVAL,
+    DEFAULT_CHECKPOINT_SIZE,
+    DEFAULT_FLUSH_INTERVAL,
+    DEFAULT_FLUSH_SIZE,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_MAX_PENDING,
+    StreamCancelled,
+    StreamingCallbackHandler,
+    BasicCallbackHandler,
+    MessageOutput,
+    LLMEndCallbackHandler,
+)
 from backend.infrastructure.utils import get_timezone, sanitize_messages, sanitize_string
 from backend.infrastructure import persistence as db
+from backend.infrastructure import persistence_async as adb
+from backend.infrastructure.streams import get_stream_registry
+from backend.infrastructure.jobs import get_job_queue, resume_unfinished_jobs
 
 import backend.infrastructure.rerankers as rerankers
 from backend.infrastructure.images import search_searx_images_wrapper
@@ -27,6 +44,9 @@ app = FastAPI()
 
 CONFIG_PATH = (Path(__file__).resolve().parents[2] / "config.toml")
 
+# Writes partial answers off the token callbacks, separate from the default executor the sync agents run in
+CHECKPOINT_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="checkpoint")
+
 
 
 ALLOWED_ORIGINS = load_main_config().get("server.allowed_origins", [])
@@ -41,6 +61,18 @@ app.add_middleware(
 
 
 
+@app.on_event("startup")
+async def recover_unfinished_work():
+    interrupted = await adb.interrupt_streaming_messages()
+    if interrupted:
+        print(f"Marked {interrupted} unfinished answers as interrupted")
+    for kind, handler in POST_ANSWER_JOBS.items():
+        get_job_queue(kind, handler)
+    resumed = await resume_unfinished_jobs()
+    if resumed:
+        print(f"Resumed {resumed} background jobs")
+
+
 @app.get("/")
 async def root():
     return "Hello World!"
@@ -60,7 +92,8 @@ async def set_settings(settings: str = Body(..., embed=True, alias="settings")):
         raise HTTPException(status_code=400, detail=error)
 
     CONFIG_PATH.write_text(settings, encoding="utf-8")
-    load_config(str(CONFIG_PATH))
+    # Subscribers drop what they derived from the previous config (clients, geocoder, reranker)
+    reload_config(str(CONFIG_PATH))
     return {"message": "Settings updated successfully"}
 
 
@@ -69,45 +102,75 @@ async def chat(q: str, preset="fast", parent: str = None, additional_context: st
     if focus == "none":
         focus = None
     
-    db_message, db_conversation = db.create_message(
+    db_message, db_conversation = await adb.create_message(
         role=db.Role.USER,
         content=q,
         parent=parent,
     )
 
-    history = db.get_conversation_chain_data(db_conversation.id, resolve_enum=True)
+    history = await adb.get_conversation_chain_data(db_conversation.id, resolve_enum=True)
 
-    handler = StreamingCallbackHandler()
+    stream_cfg = load_main_config().get("server.stream", {})
+    handler = StreamingCallbackHandler(
+        heartbeat=stream_cfg.get("heartbeat", DEFAULT_HEARTBEAT),
+        coalesce=stream_cfg.get("coalesce", True),
+        flush_interval=stream_cfg.get("flush_interval", DEFAULT_FLUSH_INTERVAL),
+        flush_size=stream_cfg.get("flush_size", DEFAULT_FLUSH_SIZE),
+        max_pending=stream_cfg.get("max_pending", DEFAULT_MAX_PENDING),
+    )
 
     new_message_uuid = uudid.uuid4()
 
-    def save_message_to_db_callback(message: list[MessageOutput]):
+    # Held while a checkpoint is written, so it never races the final write into a double insert
+    checkpoint_lock = threading.Lock()
+
+    def save_message_to_db_callback(message: list[MessageOutput], status=db.MessageStatus.COMPLETE):
         message = message[-1]
-        db.create_message(
-            role=db.Role.ASSISTANT,
-            content=message.content,
-            parent=db_message.uuid,
-            uuid=new_message_uuid,
-            thoughts=message.thinking_content,
-        )
-        db.resolve_message_maps_references(new_message_uuid)
-
-    def make_title_callback(messages: List[MessageOutput]):
-        title_ctx = initialize_context(
-            cfg=load_config(str(CONFIG_PATH)),
-            task="title",
-            model="title",
-            additional_context={},
-            callbacks=[],
-            tool_choice=[],
-            history=[],
-        )
-        title_executor = build_title_executor(title_ctx)
-        title_candidate = title_executor.invoke({"input": "USER : {}\n\n\nASSISTANT : {}".format(sanitize_string(q), sanitize_string(messages[-1].content))})
-        title_candidate = title_candidate["output"].strip().strip('"').strip("'")
-        db.set_title(db_conversation.id, title_candidate)
-
-    callback_handler = BasicCallbackHandler(save_message_to_db_callback)
+        with checkpoint_lock:
+            db.save_assistant_message(
+                content=message.content,
+                parent=db_message.uuid,
+                uuid=new_message_uuid,
+                thoughts=message.thinking_content,
+                status=status,
+            )
+
+    def checkpoint_callback(messages: list[MessageOutput]):
+        # Skipped while the previous checkpoint is still being written, the next one catches up
+        if not checkpoint_lock.acquire(blocking=False):
+            return
+        message = messages[-1]
+
+        def write():
+            try:
+                db.save_assistant_message(
+                    content=message.content,
+                    parent=db_message.uuid,
+                    uuid=new_message_uuid,
+                    thoughts=message.thinking_content,
+                    status=db.MessageStatus.STREAMING,
+                )
+            finally:
+                checkpoint_lock.release()
+
+        CHECKPOINT_EXECUTOR.submit(write)
+
+    final_messages: list[MessageOutput] | None = None
+
+    def finish_callback(messages: list[MessageOutput]):
+        nonlocal final_messages
+        if use_async:
+            # Called on the event loop, run_task writes it from a thread once the run returns
+            final_messages = messages
+        else:
+            save_message_to_db_callback(messages)
+
+    callback_handler = BasicCallbackHandler(
+        finish_callback,
+        checkpoint=checkpoint_callback,
+        checkpoint_interval=stream_cfg.get("checkpoint_interval", DEFAULT_CHECKPOINT_INTERVAL),
+        checkpoint_size=stream_cfg.get("checkpoint_size", DEFAULT_CHECKPOINT_SIZE),
+    )
 
     try:
         additional_context = json.loads(additional_context)
@@ -124,74 +187,170 @@ async def chat(q: str, preset="fast", parent: str = None, additional_context: st
         history=history,
         focus=focus,
         current_message_id=new_message_uuid,
+        conversation_id=db_conversation.id,
     )
 
-    handler.queue.put_nowait(
-        json.dumps(
-            {
-                "event": "prelude",
-                "data": {
-                    "conversation_uuid": db_conversation.uuid,
-                    "conversation_id": db_conversation.id,
-                    "model": ctx.model.dump(),
-                    "query_uuid": db_message.uuid,
-                    "response_uuid": str(new_message_uuid),
-                },
-            }
-        )
+    handler.send(
+        {
+            "event": "prelude",
+            "data": {
+                "conversation_uuid": db_conversation.uuid,
+                "conversation_id": db_conversation.id,
+                "model": ctx.model.dump(),
+                "query_uuid": db_message.uuid,
+                "response_uuid": str(new_message_uuid),
+            },
+        }
     )
 
     executor = build_search_executor(ctx)
 
-    if db_conversation.title is None:
-        title_callback_handler = BasicCallbackHandler(make_title_callback)
-        ctx.add_callback(title_callback_handler)
+    use_async = load_main_config().get("server.async_agents", True) and ctx.model.supports_async
+
+    title_job: asyncio.Task | None = None
 
     async def run_task():
+        nonlocal title_job
         try:
-            loop = asyncio.get_running_loop()
+            if use_async:
+                # Runs on the event loop: async provider client and async tools, no thread per stream
+                await executor.ainvoke({"input": sanitize_string(q)}, config={"callbacks": ctx.callbacks})
+                if final_messages is not None:
+                    await asyncio.to_thread(save_message_to_db_callback, final_messages)
+            else:
+                loop = asyncio.get_running_loop()
+
+                def _call():
+                    try:
+                        return executor.invoke({"input": sanitize_string(q)}, config={"callbacks": ctx.callbacks}, stream=True)
+                    except TypeError:
+                        return executor.invoke({"input": sanitize_string(q)}, stream=True)
+
+                res = loop.run_in_executor(None, _call)
+                await res
+            answer = callback_handler.messages()
+            if db_conversation.title is None and answer:
+                # Doesn't hold back "done", the title follows it on the same stream
+                title_job = get_job_queue("title").submit(
+                    lambda: generate_title(db_conversation.id, q, answer[-1].content)
+                )
+            if answer:
+                # Ready (or running) by the time the client asks for them once "done" arrives
+                for kind in load_main_config().get("server.jobs.precompute", PRECOMPUTED_JOBS):
+                    if kind in POST_ANSWER_JOBS:
+                        get_job_queue(kind, POST_ANSWER_JOBS[kind]).enqueue(str(new_message_uuid))
+        except (asyncio.CancelledError, StreamCancelled):
+            # The client went away: keep what was generated so far
+            partial_messages = callback_handler.messages()
+            if partial_messages:
+                await asyncio.to_thread(save_message_to_db_callback, partial_messages, db.MessageStatus.INTERRUPTED)
+        except Exception as e:
+            # Provider or tool error mid-answer: the checkpointed row mustn't stay STREAMING
+            print(f"Agent run failed: {e!r}")
+            partial_messages = callback_handler.messages()
+            if partial_messages:
+                await asyncio.to_thread(save_message_to_db_callback, partial_messages, db.MessageStatus.INTERRUPTED)
+        finally:
+            handler.done()
+
+    task = asyncio.create_task(run_task())
+
+    def abandon():
+        handler.cancel()
+        if use_async:
+            # Also aborts in-flight LLM and tool HTTP requests
+            task.cancel()
 
-            def _call():
-                try:
-                    return executor.invoke({"input": sanitize_string(q)}, config={"callbacks": ctx.callbacks}, stream=True)
-                except TypeError:
-                    return executor.invoke({"input": sanitize_string(q)}, stream=True)
+    buffer = get_stream_registry().open(str(new_message_uuid), db_conversation.id, db_message.uuid)
+    # Nobody reattached within resume_grace after the last client went away
+    buffer.on_abandon = abandon
 
-            res = loop.run_in_executor(None, _call)
-            await res
+    async def pump():
+        try:
+            while (event := await handler.next_event()) is not None:
+                buffer.append(event)
+            buffer.finish()
+            if not task.done():
+                # The stream was closed early (LLM error), nothing can consume the rest of the run
+                abandon()
+            elif title_job is not None and (title := await title_job):
+                buffer.append({"event": "title", "data": {"conversation_uuid": db_conversation.uuid, "title": title}})
         finally:
-            handler.done()
+            buffer.close()
 
-    asyncio.create_task(run_task())
+    asyncio.create_task(pump())
+
+    return StreamingResponse(
+        buffer.subscribe(heartbeat=handler.heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+    )
 
+async def generate_title(conversation_id: int, query: str, answer: str) -> str:
+    title_ctx = initialize_context(
+        cfg=load_config(str(CONFIG_PATH)),
+        task="title",
+        model="title",
+        additional_context={},
+        callbacks=[],
+        tool_choice=[],
+        history=[],
+    )
+    title_executor = build_title_executor(title_ctx)
+    title_candidate = await title_executor.ainvoke({"input": "USER : {}\n\n\nASSISTANT : {}".format(sanitize_string(query), sanitize_string(answer))})
+    title_candidate = title_candidate["output"].strip().strip('"').strip("'")
+    await adb.set_title(conversation_id, title_candidate)
+    return title_candidate
+
+@app.get("/chat/resume")
+@app.get("/chat/subscribe")
+async def resume_chat(response_uuid: str, after: int | None = Query(None, ge=-1)):
+    buffer = get_stream_registry().get(response_uuid)
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="No live or recent stream for this response")
+    if not buffer.can_replay(after):
+        raise HTTPException(status_code=410, detail="Events after this id are no longer buffered")
+    heartbeat = load_main_config().get("server.stream.heartbeat", DEFAULT_HEARTBEAT)
     return StreamingResponse(
-        handler.stream(),
+        buffer.subscribe(after=after, heartbeat=heartbeat),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
 
+async def extract_sources(message_uuid: str) -> list[db.Source]:
+    # Idempotent, a job resumed after a restart may find its sources already saved
+    sources = await adb.get_sources_by_message_uuid(message_uuid)
+    if sources:
+        return sources
+    return await asyncio.to_thread(db.create_source_pipeline, message_uuid)
+
 @app.get("/sources/get")
 async def get_sources(uuid: str):
-    sources = db.get_sources_by_message_uuid(uuid)
-    if not sources or len(sources) == 0:
-        try :
-            sources = db.create_source_pipeline(uuid)
-        except ValueError as e:
-            return {"error": str(e), "sources": []}, 500
+    sources = await adb.get_sources_by_message_uuid(uuid)
+    if (not sources or len(sources) == 0) and await adb.get_job_status("sources", uuid) != db.JobStatus.DONE:
+        if await adb.get_message_by_uuid(uuid) is None:
+            # Checked before a job row is created for it
+            raise HTTPException(status_code=404, detail="Message not found")
+        # Usually already done or running since the answer was saved, joined instead of started again
+        sources = await asyncio.shield(get_job_queue("sources", extract_sources).enqueue(uuid))
+        if sources is None:
+            return {"error": "Source extraction failed", "sources": []}, 500
     return {"sources": sources}
 
-@app.get("/images/get")
-async def get_images(uuid: str):
+@app.get("/sources/cache/stats")
+async def get_sources_cache_stats():
+    return db.get_preview_cache().stats
 
-    cached_images = db.retrieve_message_images(uuid)
+async def search_message_images(message_uuid: str) -> list[dict]:
+    cached_images = await adb.retrieve_message_images(message_uuid)
     if len(cached_images) > 0:
-        return {"images_results": cached_images}
+        return cached_images
 
-    message = db.get_message_by_uuid(uuid)
-    if message.role != db.Role.ASSISTANT:
-        raise HTTPException(status_code=400, detail="Images can only be searched for assistant messages.")
+    message = await adb.get_message_by_uuid(message_uuid)
+    if message is None or message.role != db.Role.ASSISTANT:
+        raise ValueError("Images can only be searched for assistant messages.")
     parent_id = message.parent_id if message else None
-    parent_message = db.get_message_by_uuid(parent_id) if parent_id else None
+    parent_message = await adb.get_message_by_uuid(parent_id) if parent_id else None
 
     images_prompt = "USER : {}\n\nASSISTANT : {}".format(
         sanitize_string(parent_message.content) if parent_message else "",
@@ -208,57 +367,127 @@ async def get_images(uuid: str):
         history=[],
     )
     images_search_executor = build_title_executor(images_search_ctx)
-    images_queries = images_search_executor.invoke({"input": images_prompt})
+    images_queries = await images_search_executor.ainvoke({"input": images_prompt})
     images_queries = images_queries["output"].split("\n")
     images_queries = [q.strip() for q in images_queries if len(q.strip()) > 0]
 
-    images_results = search_searx_images_wrapper(images_queries, 
+    # Blocking HTTP and CLIP inference, kept off the event loop
+    images_results = await asyncio.to_thread(
+        search_searx_images_wrapper, images_queries,
         max_results=load_config().get("images_search.total_max_results", 20)
     )
 
-    reranked = rerankers.ImageRerankerRegistry.get_default_reranker().rerank(images_results, parent_message.content if parent_message else "")
+    reranked = await asyncio.to_thread(
+        rerankers.ImageRerankerRegistry.get_default_reranker().rerank,
+        images_results, parent_message.content if parent_message else ""
+    )
 
-    db.save_message_images(reranked, uuid)
+    await adb.save_message_images(reranked, message_uuid)
 
     # convert to dict and add an idx field
-    images_results = [
+    return [
         x.model_dump() | {"idx": idx} for idx, x in enumerate(reranked)
     ]
 
+@app.get("/images/get")
+async def get_images(uuid: str):
+    message = await adb.get_message_by_uuid(uuid)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+
+    cached_images = await adb.retrieve_message_images(uuid)
+    # An image search that found nothing isn't run again
+    if len(cached_images) > 0 or await adb.get_job_status("images", uuid) == db.JobStatus.DONE:
+        return {"images_results": cached_images}
+
+    if message.role != db.Role.ASSISTANT:
+        raise HTTPException(status_code=400, detail="Images can only be searched for assistant messages.")
+
+    images_results = await asyncio.shield(get_job_queue("images", search_message_images).enqueue(uuid))
+    if images_results is None:
+        raise HTTPException(status_code=502, detail="Image search failed")
+
     return {"images_results": images_results}
 
+# Precomputed for every saved answer, by message uuid
+POST_ANSWER_JOBS = {"sources": extract_sources, "images": search_message_images}
+PRECOMPUTED_JOBS = ["sources", "images"]
+
 @app.get("/conversation/read")
 async def read_conversation(conversation_id: int | None = Query(None), uuid: UUID | None = Query(None)):
     if (conversation_id is None and uuid is None) or (conversation_id is not None and uuid is not None):
         raise HTTPException(status_code=400, detail="Provide either 'conversation_id' or 'uuid', not both.")
 
     if uuid is not None:
-        conversation = db.get_conversation_by_uuid(str(uuid))
+        conversation = await adb.get_conversation_by_uuid(str(uuid))
     else:
-        conversation = db.get_conversation_by_id(conversation_id)
+        conversation = await adb.get_conversation_by_id(conversation_id)
 
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    cid = conversation.id if hasattr(conversation, "id") else conversation_id
-    messages = db.get_conversation_chain_messages(cid)
+    return await read_active_branch(conversation)
+
+
+@app.post("/conversation/branch")
+async def switch_branch(message_uuid: str = Body(..., embed=True)):
+    try:
+        conversation = await adb.set_active_branch(message_uuid)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return await read_active_branch(conversation)
+
+
+async def read_active_branch(conversation) -> dict:
+    messages = await adb.get_conversation_chain_messages(conversation.id)
     messages = [messages.model_dump() for messages in messages]
 
+    attachments = await adb.resolve_messages_attachments([x["uuid"] for x in messages])
     messages = [
-        x | {"attachments" : db.resolve_message_attachments(x["uuid"])} for x in messages
+        x | {"attachments" : attachments[x["uuid"]]} for x in messages
+    ]
+
+    # Answers still being generated, to be followed with /chat/subscribe
+    live = [
+        {"query_uuid": b.query_uuid, "response_uuid": b.response_uuid}
+        for b in get_stream_registry().live(conversation.id)
     ]
 
-    return {"conversation": conversation, "messages": messages}
+    return {"conversation": conversation, "messages": messages, "live": live}
 
 
 @app.get("/conversation/list")
-async def list_conversations():
-    conversations = db.list_conversations()
-    return {"conversations": conversations}
+async def list_conversations(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None),
+    all_: bool = Query(False, alias="all"),
+):
+    if all_:
+        # Unpaginated response kept for older clients
+        conversations = await adb.list_conversations()
+        return {"conversations": conversations}
+    try:
+        return await adb.list_conversations_page(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/conversation/search")
+async def search_conversations(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    prefix: bool = Query(False),
+):
+    try:
+        return await adb.search_conversations(q, limit=limit, offset=offset, prefix=prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
 
 @app.get("/conversation/delete")
 async def delete_conversation(conversation_uuid: str):
-    db.delete_conversation_by_uuid(conversation_uuid)
+    await adb.delete_conversation_by_uuid(conversation_uuid)
     return {"detail": "Conversation deleted"}
 
 @app.get("/meteo")
@@ -288,8 +517,8 @@ async def list_focuses():
     focuses = load_main_config().get("focuses", {})
     f = []
     for k,v in focuses.items():
-        v["id"] = k
-        f.append(v)
+        # The config snapshot is shared, don't add the id to it
+        f.append(v | {"id": k})
     return {"focuses": f}
 
 
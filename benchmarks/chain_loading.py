@@ -0,0 +1,102 @@
+"""Benchmark active chain loading on conversations with many regenerated branches.
+
+Usage: python -m benchmarks.chain_loading [--branches 100 1000 5000] [--depth 20]
+
+The legacy loader (full conversation scan + Python walk) is reproduced here so both
+can be timed against the same database.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.infrastructure import persistence as db
+
+
+def legacy_chain_messages(chain_id: int):
+    with Session(db.get_engine()) as session:
+        msgs = session.exec(select(db.Message).where(db.Message.conversation_id == chain_id)).all()
+    children_map = {}
+    root = None
+    for m in msgs:
+        if m.parent_id is None:
+            root = m
+        else:
+            children_map.setdefault(m.parent_id, []).append(m)
+    chain = []
+    cur = root
+    while cur is not None:
+        chain.append(cur)
+        children = children_map.get(cur.uuid, [])
+        children.sort(key=lambda x: (x.timestamp, x.id or 0), reverse=True)
+        cur = children[0] if children else None
+    return chain
+
+
+def populate(session: Session, depth: int, branches: int) -> int:
+    conv = db.Conversation()
+    session.add(conv)
+    session.flush()
+    parent = None
+    tick = 0
+    for level in range(depth):
+        # Every reply on the active path gets `branches // depth` abandoned siblings
+        siblings = branches // depth + 1 if level else 1
+        kept = None
+        for _ in range(siblings):
+            tick += 1
+            msg = db.Message(
+                uuid=str(uuid4()),
+                conversation_id=conv.id,
+                role=db.Role.USER if level % 2 == 0 else db.Role.ASSISTANT,
+                content="x" * 400,
+                parent_id=parent,
+                timestamp=f"2025-01-01T00:00:00.{tick:06d}",
+            )
+            session.add(msg)
+            kept = msg
+        session.flush()
+        parent = kept.uuid
+    conv.active_leaf_uuid = parent
+    session.add(conv)
+    session.commit()
+    return conv.id
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--branches", type=int, nargs="+", default=[0, 100, 1000, 5000])
+    parser.add_argument("--depth", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        SQLModel.metadata.create_all(engine)
+        db.ensure_indexes(engine)
+        db.ENGINE = engine
+
+        print(f"{'branches':>10} {'legacy ms':>12} {'leaf ms':>10}")
+        for branches in args.branches:
+            with Session(engine) as session:
+                cid = populate(session, args.depth, branches)
+            assert [m.uuid for m in legacy_chain_messages(cid)] == [m.uuid for m in db.get_conversation_chain_messages(cid)]
+            legacy = timeit(lambda: legacy_chain_messages(cid), args.repeat)
+            leaf = timeit(lambda: db.get_conversation_chain_messages(cid), args.repeat)
+            print(f"{branches:>10} {legacy:>12.2f} {leaf:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
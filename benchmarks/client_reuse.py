@@ -0,0 +1,113 @@
+"""Benchmark time to first token with provider clients shared across requests or built per request.
+
+Usage: python -m benchmarks.client_reuse [--requests 50] [--tls] [--base-url URL --api-key KEY --model NAME]
+
+Without --base-url, a local OpenAI-compatible server streams a short answer; --tls
+serves it over HTTPS with a throwaway self-signed certificate (needs openssl). Every
+request goes through create_client like initialize_context does, "new" is
+server.reuse_clients = false.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import orjson
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+
+from backend.infrastructure.config import GlomWrapper
+from backend.infrastructure.providers import create_client, get_client_registry, get_model
+
+PORT = 8766
+
+
+async def completions(request):
+    async def chunks():
+        for token in ["Paris", " is", " the", " capital", "."]:
+            chunk = {
+                "id": "bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+                "choices": [{"index": 0, "delta": {"role": "assistant", "content": token}, "finish_reason": None}],
+            }
+            yield b"data: " + orjson.dumps(chunk) + b"\n\n"
+        yield b"data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+def serve(tls_dir: Path | None) -> uvicorn.Server:
+    app = Starlette(routes=[Route("/v1/chat/completions", completions, methods=["POST"])])
+    options = {}
+    if tls_dir is not None:
+        options = {"ssl_certfile": str(tls_dir / "cert.pem"), "ssl_keyfile": str(tls_dir / "key.pem")}
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning", **options))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def self_signed(directory: Path) -> None:
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost", "-keyout", str(directory / "key.pem"), "-out", str(directory / "cert.pem")],
+        check=True, capture_output=True,
+    )
+    # Trusted by httpx (trust_env) for the client side
+    os.environ["SSL_CERT_FILE"] = str(directory / "cert.pem")
+
+
+async def ttfb(cfg, model) -> float:
+    begin = time.perf_counter()
+    llm = create_client(cfg, model)
+    async for _ in llm.astream("What is the capital of France?"):
+        return (time.perf_counter() - begin) * 1000
+    return float("nan")
+
+
+async def run(cfg, model, requests: int) -> list[float]:
+    get_client_registry().clear()
+    await ttfb(cfg, model)  # imports and first connection, for both modes
+    return [await ttfb(cfg, model) for _ in range(requests)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--base-url")
+    parser.add_argument("--api-key", default="bench")
+    parser.add_argument("--model", default="bench")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_url = args.base_url
+        if base_url is None:
+            tls_dir = None
+            if args.tls:
+                tls_dir = Path(tmp)
+                self_signed(tls_dir)
+            serve(tls_dir)
+            base_url = f"{'https' if args.tls else 'http'}://localhost:{PORT}/v1"
+
+        provider = {"type": "openai", "api_key": args.api_key, "openai_api_base": base_url}
+        print(f"{'clients':>8} {'p50 ms':>8} {'mean ms':>8} {'max ms':>8}")
+        for label, reuse in (("new", False), ("reused", True)):
+            cfg = GlomWrapper({
+                "server": {"reuse_clients": reuse},
+                "models": {"bench": {"provider": "bench", "model_name": args.model}},
+                "provider": {"bench": provider},
+            })
+            timings = asyncio.run(run(cfg, get_model(cfg, "bench"), args.requests))
+            print(f"{label:>8} {statistics.median(timings):>8.2f} {statistics.mean(timings):>8.2f} {max(timings):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark concurrent message writes with and without the SQLite tuning profile.
+
+Usage: python -m benchmarks.concurrent_writes [--threads 16] [--writes 100]
+
+Every thread appends user/assistant turns to its own conversation through
+create_message, mimicking parallel /chat streams.
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlmodel import SQLModel
+
+from backend.infrastructure import persistence as db
+
+
+def writer(writes: int) -> int:
+    errors = 0
+    parent = None
+    for i in range(writes):
+        role = db.Role.USER if i % 2 == 0 else db.Role.ASSISTANT
+        try:
+            msg, _ = db.create_message(role=role, content="x" * 2000, parent=parent)
+            parent = msg.uuid
+        except Exception:
+            errors += 1
+    return errors
+
+
+def run(url: str, pragmas, options, threads: int, writes: int):
+    db.ENGINE = db.create_db_engine(url, pragmas, **options)
+    SQLModel.metadata.create_all(db.ENGINE)
+    db.ensure_indexes(db.ENGINE)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        errors = sum(pool.map(writer, [writes] * threads))
+    elapsed = time.perf_counter() - start
+    db.ENGINE.dispose()
+    return elapsed, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=100)
+    args = parser.parse_args()
+    total = args.threads * args.writes
+
+    profiles = {
+        "default": (None, {}),
+        "tuned": (db.SQLITE_PRAGMAS, {"pool_size": args.threads, "max_overflow": 0, "connect_args": {"check_same_thread": False}}),
+    }
+    print(f"{'profile':>8} {'seconds':>9} {'writes/s':>10} {'errors':>7}")
+    for name, (pragmas, options) in profiles.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{Path(tmp) / 'bench.db'}"
+            elapsed, errors = run(url, pragmas, options, args.threads, args.writes)
+        print(f"{name:>8} {elapsed:>9.2f} {total / elapsed:>10.0f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
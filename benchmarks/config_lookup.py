@@ -0,0 +1,61 @@
+"""Benchmark config path lookups through the dotted-path index against plain glom.
+
+Usage: python -m benchmarks.config_lookup [--config config.sample.toml] [--number 100000]
+
+Both sides read the same parsed file; "glom" is what GlomWrapper.get did before the
+index, one glom call per lookup. Times are per lookup, hits and misses separately.
+"""
+import argparse
+import timeit
+
+from glom import glom
+
+try:
+    import tomllib  # Python 3.11+
+except ModuleNotFoundError:  # pragma: no cover
+    import tomli as tomllib  # type: ignore
+
+from backend.infrastructure.config import GlomWrapper, flatten
+
+PATHS = {
+    "hit": ["server.reuse_clients", "searx.verify", "server.stream.checkpoint_interval", "models.fast.model_name", "prompts.search.template"],
+    "miss": ["focuses.unknown.cond", "server.jobs.unknown", "models.unknown.provider", "images_search.reranker.missing"],
+}
+
+
+class GlomLookup:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def get(self, path: str, default=None):
+        try:
+            return glom(self.data, path)
+        except Exception:
+            return default
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="config.sample.toml")
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with open(args.config, "rb") as f:
+        data = tomllib.load(f)
+    lookups = {"glom": GlomLookup(data), "index": GlomWrapper(data)}
+    build = timeit.timeit(lambda: flatten(data), number=100) / 100 * 1e6
+    print(f"index of {len(flatten(data))} paths built in {build:.1f} µs")
+
+    print(f"{'paths':>6} {'glom µs':>9} {'index µs':>9} {'speedup':>8}")
+    for kind, paths in PATHS.items():
+        timings = {}
+        for label, lookup in lookups.items():
+            for path in paths:
+                assert lookup.get(path) == lookups["glom"].get(path), path
+            total = timeit.timeit(lambda: [lookup.get(path) for path in paths], number=args.number)
+            timings[label] = total / (args.number * len(paths)) * 1e6
+        print(f"{kind:>6} {timings['glom']:>9.3f} {timings['index']:>9.3f} {timings['glom'] / timings['index']:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark /conversation/search latency on a large synthetic history.
+
+Usage: python -m benchmarks.search [--messages 1000000] [--per-conversation 20]
+
+Rows are bulk-inserted through the FTS triggers, then queries from
+rare to very common terms are timed.
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from sqlmodel import Session, SQLModel
+
+from backend.infrastructure import persistence as db
+from backend.infrastructure.search import ensure_search_index
+
+# Zipf-distributed vocabulary: a handful of very common words, a long tail of rare ones
+VOCABULARY = [f"w{i}" for i in range(20_000)]
+WEIGHTS = [1 / (i + 1) for i in range(len(VOCABULARY))]
+
+QUERIES = ["zanzibar", "w5000", "w50", "w0", "w3 w40"]
+
+
+def populate(engine, messages: int, per_conversation: int) -> None:
+    rng = random.Random(0)
+    conversations = messages // per_conversation
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO conversation (id, uuid, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(i + 1, str(uuid4()), " ".join(rng.choices(VOCABULARY, WEIGHTS, k=4)), i, i)
+             for i in range(conversations)],
+        )
+        batch = []
+        for i in range(messages):
+            words = rng.choices(VOCABULARY, WEIGHTS, k=60)
+            if i % 50_000 == 0:
+                words.append("zanzibar")
+            batch.append((str(uuid4()), i // per_conversation + 1, "human" if i % 2 == 0 else "ai",
+                          " ".join(words), i))
+            if len(batch) == 50_000:
+                conn.exec_driver_sql(
+                    "INSERT INTO message (uuid, conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+                batch = []
+        if batch:
+            conn.exec_driver_sql(
+                "INSERT INTO message (uuid, conversation_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)", batch)
+        conn.exec_driver_sql("INSERT INTO message_fts(message_fts) VALUES ('optimize')")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-conversation", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = db.create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}", db.SQLITE_PRAGMAS)
+        SQLModel.metadata.create_all(engine)
+        ensure_search_index(engine)
+        db.ENGINE = engine
+
+        start = time.perf_counter()
+        populate(engine, args.messages, args.per_conversation)
+        print(f"indexed {args.messages} messages in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':>22} {'hits':>5} {'ms':>8}")
+        for query in QUERIES:
+            best = float("inf")
+            for _ in range(args.repeat):
+                with Session(engine) as session:
+                    start = time.perf_counter()
+                    page = db._search_conversations(session, query, limit=20)
+                    best = min(best, time.perf_counter() - start)
+            print(f"{query:>22} {len(page.results):>5} {best * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Benchmark the SSE bridge between executor threads and the streaming response.
+
+Usage: python -m benchmarks.streaming [--tokens 500] [--interval 0.01] [--first-token-delay 0.6]
+
+A fake agent emits tokens from a worker thread, like executor.invoke does. The
+legacy handler (thread-unsafe put_nowait + 250 ms polling) is reproduced here
+so every bridge runs the same workload. `--interval 0 --tokens 20000` mimics a
+fast provider, where coalescing matters most.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from backend.infrastructure.callbacks import StreamingCallbackHandler
+
+
+class LegacyStreamingHandler:
+    def __init__(self):
+        self.queue: asyncio.Queue[str] = asyncio.Queue()
+        self._done = asyncio.Event()
+
+    def send(self, payload: dict) -> None:
+        self.queue.put_nowait(json.dumps(payload))
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.send({"event": "new_token", "id": 0, "data": token, "parent": None, "tags": []})
+
+    async def stream(self):
+        yield json.dumps({"event": "ok"}) + "\n"
+        while not (self._done.is_set() and self.queue.empty()):
+            try:
+                item = await asyncio.wait_for(self.queue.get(), timeout=0.25)
+                yield f"{item}\n"
+            except asyncio.TimeoutError:
+                yield json.dumps({"event": "heartbeat"}) + "\n"
+        yield json.dumps({"event": "done"}) + "\n"
+
+    def done(self):
+        self._done.set()
+
+
+def agent(handler, tokens: int, interval: float, first_token_delay: float) -> None:
+    time.sleep(first_token_delay)
+    for _ in range(tokens):
+        # Each token carries its emission time, merged frames report their first token's
+        handler.on_llm_new_token(f"{time.perf_counter():.9f};")
+        if interval:
+            time.sleep(interval)
+
+
+async def run(handler, args) -> dict:
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    cpu = time.process_time()
+
+    async def produce():
+        try:
+            await loop.run_in_executor(None, agent, handler, args.tokens, args.interval, args.first_token_delay)
+        finally:
+            handler.done()
+
+    task = asyncio.create_task(produce())
+    first_token, frames, tokens, heartbeats, delays = None, 0, 0, 0, []
+    async for frame in handler.stream():
+        frames += 1
+        event = json.loads(frame)
+        if event["event"] == "heartbeat":
+            heartbeats += 1
+        elif event["event"] == "new_token":
+            now = time.perf_counter()
+            first_token = first_token or now - start
+            sent = event["data"].split(";")[:-1]
+            tokens += len(sent)
+            delays.append(now - float(sent[0]))
+    await task
+    elapsed = time.perf_counter() - start
+    delays.sort()
+    return {
+        "ttft ms": first_token * 1000,
+        "total ms": elapsed * 1000,
+        "p50 delay ms": delays[len(delays) // 2] * 1000,
+        "max delay ms": delays[-1] * 1000,
+        "tokens": tokens,
+        "frames": frames,
+        "heartbeats": heartbeats,
+        "cpu ms": (time.process_time() - cpu) * 1000,
+    }
+
+
+async def main_async(args) -> None:
+    results = {
+        "legacy": await run(LegacyStreamingHandler(), args),
+        "bridge": await run(StreamingCallbackHandler(heartbeat=args.heartbeat, coalesce=False), args),
+        "coalesced": await run(StreamingCallbackHandler(heartbeat=args.heartbeat), args),
+    }
+    columns = list(results["legacy"])
+    print(f"{'':>10} " + " ".join(f"{c:>13}" for c in columns))
+    for name, row in results.items():
+        print(f"{name:>10} " + " ".join(f"{row[c]:>13.1f}" for c in columns))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--first-token-delay", type=float, default=0.6)
+    parser.add_argument("--heartbeat", type=float, default=15.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
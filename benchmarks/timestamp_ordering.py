@@ -0,0 +1,99 @@
+"""Benchmark sort-heavy queries on ISO string vs integer epoch microsecond timestamps.
+
+Usage: python -m benchmarks.timestamp_ordering [--conversations 20000] [--messages 40]
+
+Both layouts hold the same rows. "before" is the previous schema (VARCHAR
+timestamps, single-column conversation_id index), "after" is the current one
+(BIGINT timestamps, (conversation_id, timestamp) and (updated_at, id) indexes).
+"""
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from backend.infrastructure.utils import iso_to_micros
+
+LAYOUTS = {
+    "before": (
+        "TEXT",
+        [
+            "CREATE INDEX ix_message_conversation_id ON message (conversation_id)",
+            "CREATE INDEX ix_message_parent_timestamp_id ON message (parent_id, timestamp, id)",
+            "CREATE INDEX ix_conversation_updated_at ON conversation (updated_at)",
+        ],
+    ),
+    "after": (
+        "BIGINT",
+        [
+            "CREATE INDEX ix_message_conversation_timestamp ON message (conversation_id, timestamp)",
+            "CREATE INDEX ix_message_parent_timestamp_id ON message (parent_id, timestamp, id)",
+            "CREATE INDEX ix_conversation_updated_at_id ON conversation (updated_at, id)",
+        ],
+    ),
+}
+
+QUERIES = {
+    "conversation history": "SELECT * FROM message WHERE conversation_id = :cid ORDER BY timestamp",
+    "latest child": "SELECT id FROM message WHERE parent_id = :parent ORDER BY timestamp DESC, id DESC LIMIT 1",
+    "conversation list page": "SELECT id, uuid, title, updated_at FROM conversation ORDER BY updated_at DESC, id DESC LIMIT 50",
+    "recent messages": "SELECT conversation_id, max(timestamp) FROM message GROUP BY conversation_id ORDER BY 2 DESC LIMIT 50",
+}
+
+
+def build(path: Path, column_type: str, indexes, rows, conversations) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE conversation (id INTEGER PRIMARY KEY, uuid TEXT, title TEXT, updated_at {column_type})")
+    conn.execute(
+        f"CREATE TABLE message (id INTEGER PRIMARY KEY, conversation_id INTEGER, parent_id TEXT, content TEXT, timestamp {column_type})"
+    )
+    convert = iso_to_micros if column_type == "BIGINT" else str
+    conn.executemany("INSERT INTO conversation VALUES (?, ?, ?, ?)", [(c[0], c[1], c[2], convert(c[3])) for c in conversations])
+    conn.executemany("INSERT INTO message VALUES (?, ?, ?, ?, ?)", [(r[0], r[1], r[2], r[3], convert(r[4])) for r in rows])
+    for index in indexes:
+        conn.execute(index)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    rows, conversations = [], []
+    for cid in range(1, args.conversations + 1):
+        ts = start + timedelta(seconds=rng.randint(0, 30_000_000))
+        parent = None
+        for _ in range(args.messages):
+            ts += timedelta(microseconds=rng.randint(1, 10_000_000))
+            rows.append((len(rows) + 1, cid, parent, "x" * 200, ts.isoformat()))
+            parent = f"m{len(rows)}"
+        conversations.append((cid, f"c{cid}", "title", ts.isoformat()))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conns = {
+            name: build(Path(tmp) / f"{name}.db", column_type, indexes, rows, conversations)
+            for name, (column_type, indexes) in LAYOUTS.items()
+        }
+        params = {"cid": args.conversations // 2, "parent": f"m{len(rows) // 2}"}
+        print(f"{'query':>24} {'before ms':>10} {'after ms':>10}")
+        for label, sql in QUERIES.items():
+            timings = []
+            for conn in conns.values():
+                begin = time.perf_counter()
+                for _ in range(args.repeat):
+                    conn.execute(sql, params).fetchall()
+                timings.append((time.perf_counter() - begin) / args.repeat * 1000)
+            print(f"{label:>24} {timings[0]:>10.3f} {timings[1]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
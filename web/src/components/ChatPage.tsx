@@ -6,7 +6,7 @@ import { Icon } from "@iconify/react";
 import ChatMessage from "@/components/ChatMessage";
 import { getChat } from "@/hooks/chat";
 import AskBar, { querySignal } from "@/components/AskBar";
-import { sendMessage } from "@/hooks/sendMessage";
+import { sendMessage, joinStream } from "@/hooks/sendMessage";
 import { useSignalEffect } from "@preact/signals-react";
 import { getCookie, countPrintableChars } from "@/lib/utils";
 import { chatStream } from "@/signals/chatStream";
@@ -45,6 +45,7 @@ export default function ChatPage({ chatId }: Props) {
   const currentQueryRef = useRef<string | null>(null);
   const currentResponseRef = useRef<string | null>(null);
   const conversationUuidRef = useRef<string | null>(null);
+  const streamTitleRef = useRef<string | null>(null);
 
   const newConvModeRef = useRef<boolean>(false);
   const urlNormalizedRef = useRef<boolean>(false);
@@ -102,7 +103,9 @@ export default function ChatPage({ chatId }: Props) {
 
   async function loadConversationAndMessages(convUuid: string) {
     const data = await getChat(convUuid);
-    const title = data?.data?.conversation?.title || "Untitled";
+    // The title event can arrive while the conversation is being fetched
+    const title =
+      data?.data?.conversation?.title || streamTitleRef.current || "Untitled";
     document.title = `Chat - ${title}`;
     setChatTitle(title);
 
@@ -115,27 +118,31 @@ export default function ChatPage({ chatId }: Props) {
         attachments: m.attachments ?? []
       })
     );
+    // The answer to the last message is still being generated elsewhere: follow it
+    const live = (data?.data?.live || []).find(
+      (l: any) =>
+        l.query_uuid === fetched.at(-1)?.uuid ||
+        l.response_uuid === fetched.at(-1)?.uuid
+    );
+    if (live && fetched.at(-1)?.uuid === live.response_uuid) {
+      // Checkpointed partial answer, replaced by the stream which starts from the beginning
+      fetched.pop();
+    }
+
     setMessages(fetched);
     lastUuidRef.current = fetched.at(-1)?.uuid ?? null;
     scrollToBottom(listRef.current, false);
-  }
 
-  async function refreshTitleWithRetry(
-    convUuid: string,
-    tries = 5,
-    delayMs = 600
-  ) {
-    for (let i = 0; i < tries; i++) {
-      try {
-        const data = await getChat(convUuid);
-        const maybe = data?.data?.conversation?.title;
-        if (maybe && maybe !== "Untitled") {
-          document.title = `Chat - ${maybe}`;
-          setChatTitle(maybe);
-          return;
-        }
-      } catch {}
-      await new Promise((r) => setTimeout(r, delayMs));
+    if (live && !inFlightRef.current) {
+      inFlightRef.current = true;
+      newConvModeRef.current = false;
+      setUserInput(null);
+      setThinking(null);
+      setIsThinking(false);
+      setAiWriting("");
+      currentQueryRef.current = null;
+      currentResponseRef.current = null;
+      joinStream(live.response_uuid);
     }
   }
 
@@ -236,6 +243,16 @@ export default function ChatPage({ chatId }: Props) {
       case "heartbeat":
       case "llm_end":
         break;
+      case "title": {
+        // Generated in the background, sent after "done" for new conversations
+        const title = evt.data?.title;
+        if (title && evt.data?.conversation_uuid === conversationUuidRef.current) {
+          streamTitleRef.current = title;
+          document.title = `Chat - ${title}`;
+          setChatTitle(title);
+        }
+        break;
+      }
       case "new_thinking_token":
         setIsThinking(false);
         setThinking((prev) => (prev ?? "") + (evt.data || ""));
@@ -300,7 +317,6 @@ export default function ChatPage({ chatId }: Props) {
           if (convUuid && !hasHydratedOnceRef.current) {
             hasHydratedOnceRef.current = true;
             loadConversationAndMessages(convUuid).catch(() => {});
-            refreshTitleWithRetry(convUuid, 6, 700).catch(() => {});
           }
         } else {
           if (text.length > 0) {
@@ -1,6 +1,6 @@
 import { Icon } from "@iconify/react";
 import { motion } from "framer-motion";
-import { useEffect, useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 import { getChats } from "@/hooks/chat";
 import ConversationElem from "./ConversationElem";
 import { deleteChat } from "@/hooks/chat";
@@ -8,28 +8,44 @@ import { deleteChat } from "@/hooks/chat";
 
 export default function LibraryPage() {
   const [conversations, setConversations] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
+  const [hasMore, setHasMore] = useState(true);
+  const loading = useRef(false);
+  const mounted = useRef(true);
+
+  const loadMore = useCallback(async () => {
+    if (loading.current || !hasMore) return;
+    loading.current = true;
+    try {
+      const response = await getChats(cursor);
+      if (!mounted.current) return;
+      const page = response.data?.conversations ?? [];
+      setConversations((prev) => [...prev, ...page]);
+      setCursor(response.data?.next_cursor ?? null);
+      setHasMore(Boolean(response.data?.next_cursor));
+    } catch (error) {
+      console.error("Error fetching conversations:", error);
+    } finally {
+      loading.current = false;
+    }
+  }, [cursor, hasMore]);
 
   useEffect(() => {
-    let mounted = true;
-    (async () => {
-      try {
-        const response = await getChats();
-        if (mounted) {
-          // Sort by updated_at descending
-          response.data?.conversations?.sort((a: any, b: any) => {
-            return new Date(b.updated_at).getTime() - new Date(a.updated_at).getTime();
-          });
-          setConversations(response.data?.conversations ?? []);
-        }
-      } catch (error) {
-        console.error("Error fetching conversations:", error);
-      }
-    })();
+    mounted.current = true;
+    loadMore();
     return () => {
-      mounted = false;
+      mounted.current = false;
     };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
+  const onScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    const el = e.currentTarget;
+    if (el.scrollHeight - el.scrollTop - el.clientHeight < 200) {
+      loadMore();
+    }
+  };
+
   return (
     <div className="h-full w-full bg-[#0c0d10] text-white flex flex-col min-h-0">
       <div className="px-6 py-4 border-b border-white/10 flex items-center gap-2 justify-center sticky top-0 z-20 bg-[#0c0d10]/90 backdrop-blur">
@@ -40,7 +56,7 @@ export default function LibraryPage() {
       </div>
 
       {/* Content scrollable */}
-      <div className="flex-1 overflow-y-auto min-h-0 flex justify-center">
+      <div className="flex-1 overflow-y-auto min-h-0 flex justify-center" onScroll={onScroll}>
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-1 gap-6 p-6 pt-8 w-full max-w-3xl">
           {conversations.map((conv, index) => {
             const uuid = conv.uuid;
@@ -5,8 +5,8 @@ export function getChat(uuid: string) {
     return api.get(`/conversation/read?uuid=${uuid}`);
 }
 
-export function getChats() {
-    return api.get(`/conversation/list`);
+export function getChats(cursor?: string | null, limit: number = 50) {
+    return api.get(`/conversation/list`, { params: { limit, cursor: cursor ?? undefined } });
 }
 
 export function deleteChat(uuid: string) {
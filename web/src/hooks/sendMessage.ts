@@ -2,6 +2,30 @@ import { chatStream } from "@/signals/chatStream";
 import {getContextSync} from "@/lib/contextstore";
 import { getCookie } from "@/lib/utils";
 
+const MAX_RESUME_ATTEMPTS = 5;
+const RESUME_DELAY_MS = 1000;
+
+async function readLines(res: Response, onLine: (line: string) => void) {
+  if (!res.body) return;
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let nl;
+    while ((nl = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, nl);
+      buffer = buffer.slice(nl + 1);
+      if (line.trim().length) onLine(line);
+    }
+  }
+}
+
 export async function sendMessage(parent_uuid: string | null, content: string, mode = "speed") {
   chatStream.value = [];
 
@@ -11,31 +35,64 @@ export async function sendMessage(parent_uuid: string | null, content: string, m
   params.set("q", content);
 
   const focus = getCookie("focus");
-  if (focus && focus !== "none") { 
+  if (focus && focus !== "none") {
     params.set("focus", focus);
   }
 
   const ctx = JSON.stringify(getContextSync());
   params.set("additional_context", ctx || "");
 
-  const url = `/api/chat?${params.toString()}`;
-  const res = await fetch(url);
-  if (!res.body) return;
+  await followStream(fetch(`/api/chat?${params.toString()}`));
+}
 
-  const reader = res.body.getReader();
-  const decoder = new TextDecoder();
-  let buffer = "";
+// Follows an answer another client started, from its first event
+export async function joinStream(responseUuid: string) {
+  chatStream.value = [];
+  const params = new URLSearchParams({ response_uuid: responseUuid });
+  await followStream(fetch(`/api/chat/subscribe?${params.toString()}`), responseUuid);
+}
 
-  while (true) {
-    const { done, value } = await reader.read();
-    if (done) break;
-    buffer += decoder.decode(value, { stream: true });
+async function followStream(request: Promise<Response>, knownUuid: string | null = null) {
+  let responseUuid: string | null = knownUuid;
+  let lastId = -1;
+  let finished = false;
 
-    let nl;
-    while ((nl = buffer.indexOf("\n")) >= 0) {
-      const line = buffer.slice(0, nl);
-      buffer = buffer.slice(nl + 1);
-      if (line.trim().length) chatStream.value = [...chatStream.value, line];
+  const push = (line: string) => {
+    try {
+      const evt = JSON.parse(line);
+      if (evt.event === "prelude") responseUuid = evt.data?.response_uuid ?? null;
+      if (typeof evt.id === "number") lastId = evt.id;
+      if (evt.event === "done") finished = true;
+      // A resumed stream starts with its own "ok", which would reset the answer being written
+      if (evt.event === "ok" && chatStream.value.length) return;
+    } catch {
+      // Not JSON, forwarded as is
+    }
+    chatStream.value = [...chatStream.value, line];
+  };
+
+  let res = await request;
+
+  // A dropped connection reattaches to the same generation from the last event received
+  for (let attempt = 0; ; attempt++) {
+    try {
+      if (res.ok) await readLines(res, push);
+    } catch {
+      // Connection lost mid-stream
+    }
+    if (finished || !responseUuid || !res.ok || attempt >= MAX_RESUME_ATTEMPTS) break;
+
+    await new Promise((resolve) => setTimeout(resolve, RESUME_DELAY_MS));
+    const resume = new URLSearchParams({ response_uuid: responseUuid, after: String(lastId) });
+    try {
+      res = await fetch(`/api/chat/resume?${resume.toString()}`);
+    } catch {
+      continue;
     }
   }
+
+  if (!finished && responseUuid) {
+    // Let the page settle and reload the conversation from the server
+    push(JSON.stringify({ event: "done" }));
+  }
 }